@@ -0,0 +1,220 @@
+"""按设备共享的视频采集服务
+
+每个摄像头只由一个采集进程打开并解码，解码后的原始帧写入共享内存缓冲区，
+设备预览、各个监控任务以及绑定到该设备的所有算法都从同一个缓冲区读取。
+采集进程按引用计数启动和停止，最后一个使用方释放后才断开 RTSP 连接。
+服务的方法在事件循环中调用，停止采集进程时只发送信号，等待退出交给后台线程。
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing.process import BaseProcess
+from typing import Dict, Hashable, Optional, Set
+
+import cv2
+import numpy as np
+
+import reaper
+from frame_buffer import SharedFrameBuffer
+
+logger = logging.getLogger(__name__)
+
+
+def run_device_capture(device_id: int, device_url: str, frame_buffer: SharedFrameBuffer):
+    """采集进程：持续解码视频流并写入共享缓冲区，断流后自动重连"""
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Capture process started for device {device_id}")
+    cap = None
+    try:
+        while True:
+            cap = cv2.VideoCapture(device_url)
+            if not cap.isOpened():
+                logger.warning(f"Failed to open stream for device {device_id}, retrying")
+                cap.release()
+                time.sleep(1)
+                continue
+
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    logger.warning(f"Stream interrupted for device {device_id}, reconnecting")
+                    break
+                frame_buffer.write_array(frame)
+
+            cap.release()
+            time.sleep(1)  # 等待一秒后重试
+    except Exception as e:
+        logger.error(f"Error in device capture {device_id}: {str(e)}")
+    finally:
+        if cap:
+            cap.release()
+        logger.info(f"Capture process stopped for device {device_id}")
+
+
+class SharedFrameSource:
+    """从设备共享采集缓冲区读取最新帧，并统计因处理较慢而跳过的帧数"""
+
+    def __init__(self, frame_buffer: SharedFrameBuffer):
+        self.frame_buffer = frame_buffer
+        self.last_seq = 0
+        self.skipped = 0
+        # 最近一次读取的帧的采集时间
+        self.timestamp = 0.0
+
+    def read(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """返回上次读取之后的最新一帧，超时返回 None"""
+        packet = self.frame_buffer.wait(self.last_seq, timeout)
+        if packet is None:
+            return None
+        if self.last_seq:
+            self.skipped += packet.seq - self.last_seq - 1
+        self.last_seq = packet.seq
+        self.timestamp = packet.timestamp
+        return packet.to_array()
+
+    def release(self):
+        pass
+
+
+class LatestFrameGrabber:
+    """独立线程持续读取视频流，只保留最新一帧
+
+    推理慢于摄像头帧率时，OpenCV 内部缓冲不会积压，读取方总是拿到最新画面，
+    中间被覆盖的帧计入 skipped。断流后线程自动重连。
+    """
+
+    def __init__(self, device_url: str):
+        self.device_url = device_url
+        self.skipped = 0
+        # 最近一次读取的帧的采集时间
+        self.timestamp = 0.0
+        self._frame: Optional[np.ndarray] = None
+        self._frame_at = 0.0
+        self._seq = 0
+        self._last_seq = 0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"grabber-{device_url}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            cap = cv2.VideoCapture(self.device_url)
+            if not cap.isOpened():
+                logger.warning(f"Failed to open stream {self.device_url}, retrying")
+                cap.release()
+                self._stopped.wait(1)
+                continue
+            while not self._stopped.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    logger.warning(f"Stream interrupted {self.device_url}, reconnecting")
+                    break
+                with self._cond:
+                    self._frame = frame
+                    self._frame_at = time.time()
+                    self._seq += 1
+                    self._cond.notify_all()
+            cap.release()
+            self._stopped.wait(1)  # 等待一秒后重试
+
+    def read(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """返回上次读取之后的最新一帧，超时返回 None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._last_seq, timeout):
+                return None
+            if self._last_seq:
+                self.skipped += self._seq - self._last_seq - 1
+            self._last_seq = self._seq
+            self.timestamp = self._frame_at
+            return self._frame
+
+    def release(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+
+
+class _Capture:
+    def __init__(self, device_url: str, frame_buffer: SharedFrameBuffer, process: BaseProcess):
+        self.device_url = device_url
+        self.frame_buffer = frame_buffer
+        self.process = process
+        self.consumers: Set[Hashable] = set()
+
+
+class CaptureService:
+    """管理各设备的采集进程，以使用方（预览、监控任务）为单位做引用计数"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        # 与工作进程池共用 forkserver，采集进程不继承 API 进程的线程、事件循环和信号处理函数
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._captures: Dict[int, _Capture] = {}
+
+    def acquire(self, device_id: int, device_url: str, consumer: Hashable) -> SharedFrameBuffer:
+        """为使用方获取设备的原始帧缓冲区，必要时启动采集进程"""
+        capture = self._captures.get(device_id)
+        if capture is None:
+            capture = self._start(device_id, device_url)
+        elif not capture.process.is_alive() or capture.device_url != device_url:
+            # 采集进程异常退出或地址已变更，沿用原缓冲区重启，已有使用方无需重新附加
+            capture.device_url = device_url
+            self.restart(device_id)
+        capture.consumers.add(consumer)
+        logger.info(f"Capture for device {device_id} acquired by {consumer}, refs={len(capture.consumers)}")
+        return capture.frame_buffer
+
+    def release(self, consumer: Hashable):
+        """释放使用方持有的引用，设备无人使用时停止采集进程"""
+        for device_id, capture in list(self._captures.items()):
+            if consumer not in capture.consumers:
+                continue
+            capture.consumers.discard(consumer)
+            logger.info(f"Capture for device {device_id} released by {consumer}, refs={len(capture.consumers)}")
+            if not capture.consumers:
+                self._stop(device_id)
+
+    def restart(self, device_id: int):
+        """重启设备的采集进程，用于采集进程卡在读取视频流中的情况，使用方无需重新附加"""
+        capture = self._captures.get(device_id)
+        if capture is None:
+            return
+        # 采集进程使用默认的 SIGTERM 处理，即使卡在读取视频流中也会立即结束
+        capture.process.terminate()
+        reaper.reap(capture.process)
+        capture.process = self._spawn(device_id, capture.device_url, capture.frame_buffer)
+
+    def is_active(self, device_id: int, max_age: float = 5.0) -> bool:
+        """设备是否正在采集且最近 max_age 秒内有新帧"""
+        capture = self._captures.get(device_id)
+        if capture is None or not capture.process.is_alive():
+            return False
+        timestamp = capture.frame_buffer.latest_timestamp()
+        return timestamp is not None and time.time() - timestamp <= max_age
+
+    def stop_all(self):
+        for device_id in list(self._captures):
+            self._stop(device_id)
+
+    def _spawn(self, device_id: int, device_url: str, frame_buffer: SharedFrameBuffer) -> BaseProcess:
+        process = self._ctx.Process(target=run_device_capture, args=(device_id, device_url, frame_buffer))
+        process.start()
+        return process
+
+    def _start(self, device_id: int, device_url: str) -> _Capture:
+        # 槽位容量由采集进程按第一帧的大小确定，分辨率变大时自动换用更大的缓冲区
+        # 各使用方在自己的进程中轮询读取，不需要唤醒管道
+        frame_buffer = SharedFrameBuffer.create(self.slots, 0, notify=False)
+        capture = _Capture(device_url, frame_buffer, self._spawn(device_id, device_url, frame_buffer))
+        self._captures[device_id] = capture
+        return capture
+
+    def _stop(self, device_id: int):
+        capture = self._captures.pop(device_id, None)
+        if capture is None:
+            return
+        capture.process.terminate()
+        reaper.reap(capture.process)
+        # 共享内存删除后已附加的进程仍可访问，直到各自退出
+        capture.frame_buffer.close()
@@ -14,7 +14,7 @@ async def get_session() -> AsyncSession:
         yield session
 
 async def init_db():
-    """初始化数据库表"""
+    """初始化数据库表，已有数据库的表结构变更通过 alembic upgrade head 完成"""
     from models import Base
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
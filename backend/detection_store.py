@@ -0,0 +1,135 @@
+"""按任务存储检测结果的分块二进制文件
+
+每个任务的检测结果保存在结果目录下的 detections 子目录中，写入方在内存中累积若干帧后
+一次写出一个分块文件，文件名记录分块覆盖的帧区间，如 chunk_000001000_000001999.npy。
+分块只追加不修改，多个写入方（例如并行处理的视频分段）可以写入同一目录。
+每个分块是按帧号排序的结构化数组，各列可以直接按名称取出；查询时只加载与帧区间重叠的分块。
+"""
+import logging
+import os
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DETECTION_DTYPE = np.dtype([
+    ("frame", "<u4"),
+    ("x1", "<f4"),
+    ("y1", "<f4"),
+    ("x2", "<f4"),
+    ("y2", "<f4"),
+    ("conf", "<f4"),
+    ("cls", "<u2"),
+    # 跟踪编号，未启用跟踪时为 -1
+    ("track", "<i4"),
+])
+
+_CHUNK_PATTERN = re.compile(r"^chunk_(\d+)_(\d+)\.npy$")
+
+
+def detections_dir(result_dir: str) -> str:
+    return os.path.join(result_dir, "detections")
+
+
+class DetectionWriter:
+    """追加写入检测结果，每 chunk_frames 帧写出一个分块"""
+
+    def __init__(self, directory: str, chunk_frames: int = 1000):
+        self.directory = directory
+        self.chunk_frames = max(chunk_frames, 1)
+        self._rows: List[np.ndarray] = []
+        self._first_frame: Optional[int] = None
+        self._last_frame: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, frame_index: int, detections: np.ndarray, track_ids: Optional[np.ndarray] = None):
+        """记录一帧的检测结果（N×6 数组）及对应的跟踪编号，没有目标的帧也计入分块的帧区间"""
+        if self._first_frame is None:
+            self._first_frame = frame_index
+        self._last_frame = frame_index
+        if len(detections):
+            rows = np.empty(len(detections), dtype=DETECTION_DTYPE)
+            rows["frame"] = frame_index
+            rows["x1"], rows["y1"], rows["x2"], rows["y2"] = detections[:, :4].T
+            rows["conf"] = detections[:, 4]
+            rows["cls"] = detections[:, 5]
+            rows["track"] = -1 if track_ids is None else track_ids
+            self._rows.append(rows)
+        if self._last_frame - self._first_frame + 1 >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if self._first_frame is None:
+            return
+        rows = np.concatenate(self._rows) if self._rows else np.empty(0, dtype=DETECTION_DTYPE)
+        name = f"chunk_{self._first_frame:09d}_{self._last_frame:09d}.npy"
+        # 先写临时文件再改名，查询方不会读到写了一半的分块
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._rows = []
+        self._first_frame = self._last_frame = None
+
+    def close(self):
+        self.flush()
+
+
+def _chunks(directory: str) -> List[Tuple[int, int, str]]:
+    if not os.path.isdir(directory):
+        return []
+    chunks = []
+    for name in os.listdir(directory):
+        match = _CHUNK_PATTERN.match(name)
+        if match:
+            chunks.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    chunks.sort()
+    return chunks
+
+
+def frame_range(directory: str) -> Optional[Tuple[int, int]]:
+    """已写入的帧区间（闭区间），没有数据时返回 None"""
+    chunks = _chunks(directory)
+    if not chunks:
+        return None
+    return chunks[0][0], max(last for _, last, _ in chunks)
+
+
+def query_detections(
+    directory: str,
+    start_frame: Optional[int] = None,
+    end_frame: Optional[int] = None,
+    classes: Optional[Iterable[int]] = None,
+    min_conf: Optional[float] = None
+) -> np.ndarray:
+    """按帧区间 [start_frame, end_frame)、类别和最低置信度查询检测结果，按帧号排序返回"""
+    parts = []
+    for first, last, path in _chunks(directory):
+        if start_frame is not None and last < start_frame:
+            continue
+        if end_frame is not None and first >= end_frame:
+            continue
+        rows = np.load(path, mmap_mode="r")
+        if not len(rows):
+            continue
+        mask = np.ones(len(rows), dtype=bool)
+        if start_frame is not None:
+            mask &= rows["frame"] >= start_frame
+        if end_frame is not None:
+            mask &= rows["frame"] < end_frame
+        if classes is not None:
+            mask &= np.isin(rows["cls"], list(classes))
+        if min_conf is not None:
+            mask &= rows["conf"] >= min_conf
+        parts.append(np.asarray(rows[mask]))
+    if not parts:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+    return np.concatenate(parts)
+
+
+def clear_detections(directory: str):
+    """删除目录中的全部分块，重新开始写入前调用"""
+    for _, _, path in _chunks(directory):
+        os.remove(path)
@@ -0,0 +1,103 @@
+"""检测结果的紧凑表示与通用处理
+
+检测结果统一使用 float32 数组，每行为 [x1, y1, x2, y2, 置信度, 类别]，
+便于在进程间传递、写入日志以及在帧上绘制。
+"""
+import json
+import struct
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+DETECTION_COLUMNS = 6
+
+# 监控画面消息：魔数 + 4 字节小端 JSON 头部长度 + JSON 头部（检测结果）+ 原始画面 JPEG
+FRAME_MESSAGE_MAGIC = b"SIDF"
+
+# 按类别循环取色（BGR）
+_PALETTE = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255),
+]
+
+
+def empty_detections() -> np.ndarray:
+    return np.zeros((0, DETECTION_COLUMNS), dtype=np.float32)
+
+
+def boxes_to_array(boxes) -> np.ndarray:
+    """将 ultralytics 的 Boxes 转换为 N×6 的检测数组"""
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+    xyxy = boxes.xyxy.cpu().numpy()
+    conf = boxes.conf.cpu().numpy()[:, None]
+    cls = boxes.cls.cpu().numpy()[:, None]
+    return np.hstack([xyxy, conf, cls]).astype(np.float32)
+
+
+def draw_detections(
+    frame: np.ndarray,
+    detections: np.ndarray,
+    names: Optional[Dict[int, str]] = None,
+    track_ids: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """在帧上绘制检测框和标签（原地修改并返回该帧），有跟踪编号时标签前加上编号"""
+    thickness = max(round(sum(frame.shape[:2]) / 2 * 0.003), 2)
+    for index, (x1, y1, x2, y2, conf, cls) in enumerate(detections):
+        cls = int(cls)
+        color = _PALETTE[cls % len(_PALETTE)]
+        p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+        cv2.rectangle(frame, p1, p2, color, thickness, cv2.LINE_AA)
+        label = f"{names.get(cls, cls) if names else cls} {conf:.2f}"
+        if track_ids is not None:
+            label = f"#{track_ids[index]} {label}"
+        (w, h), _ = cv2.getTextSize(label, 0, thickness / 3, max(thickness - 1, 1))
+        outside = p1[1] - h >= 3
+        q2 = (p1[0] + w, p1[1] - h - 3 if outside else p1[1] + h + 3)
+        cv2.rectangle(frame, p1, q2, color, -1, cv2.LINE_AA)
+        cv2.putText(
+            frame, label, (p1[0], p1[1] - 2 if outside else p1[1] + h + 2),
+            0, thickness / 3, (255, 255, 255), max(thickness - 1, 1), cv2.LINE_AA
+        )
+    return frame
+
+
+def pack_frame_message(
+    jpeg: bytes,
+    detections: np.ndarray,
+    names: Optional[Dict[int, str]] = None,
+    shape: Optional[tuple] = None,
+    track_ids: Optional[np.ndarray] = None
+) -> bytes:
+    """把未绘制的原始画面和检测结果打包为一条 WebSocket 消息，由前端绘制检测框"""
+    classes = detections[:, 5].astype(int).tolist()
+    header = {
+        "width": shape[1] if shape else None,
+        "height": shape[0] if shape else None,
+        "boxes": np.round(detections[:, :4].astype(float), 1).tolist(),
+        "scores": np.round(detections[:, 4].astype(float), 3).tolist(),
+        "classes": classes,
+        "names": {str(cls): str(names.get(cls, cls)) for cls in set(classes)} if names else {}
+    }
+    if track_ids is not None:
+        header["track_ids"] = track_ids.tolist()
+    payload = json.dumps(header, separators=(",", ":")).encode()
+    return FRAME_MESSAGE_MAGIC + struct.pack("<I", len(payload)) + payload + bytes(jpeg)
+
+
+def log_results(results, log_file, frame_count=None, total_frames=None):
+    """记录处理结果到日志"""
+    if not results['success']:
+        return
+
+    with open(log_file, "a") as f:
+        frame_info = f"\n帧 {frame_count}/{total_frames}:" if frame_count is not None else "\n当前帧:"
+        f.write(frame_info + "\n")
+        f.write(f"检测到 {results['num_objects']} 个目标\n")
+        for row in results['boxes']:
+            cls = int(row[5])
+            conf = float(row[4])
+            f.write(f"  类别 {cls}, 置信度 {conf:.2f}\n")
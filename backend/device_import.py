@@ -0,0 +1,48 @@
+"""批量导入设备的文件解析
+
+支持 CSV（表头包含 name 和 rtsp_url 两列）和 JSON（设备对象数组，或 {"devices": [...]}）。
+"""
+import csv
+import io
+import json
+from typing import List
+
+
+class DeviceImportError(ValueError):
+    """导入文件格式错误"""
+
+
+def parse_device_file(filename: str, content: bytes) -> List[dict]:
+    """解析导入文件，返回 [{"row", "name", "rtsp_url"}]，row 为文件中的行号或数组下标（从 1 开始）"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise DeviceImportError("文件需使用 UTF-8 编码")
+
+    if filename.lower().endswith(".json") or text.lstrip().startswith(("[", "{")):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise DeviceImportError(f"JSON 格式错误: {e.msg}（第 {e.lineno} 行）")
+        if isinstance(data, dict):
+            data = data.get("devices")
+        if not isinstance(data, list):
+            raise DeviceImportError("JSON 需为设备数组或包含 devices 数组的对象")
+        items = [(index + 1, item if isinstance(item, dict) else {}) for index, item in enumerate(data)]
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        fields = [field.strip() for field in reader.fieldnames or []]
+        if "name" not in fields or "rtsp_url" not in fields:
+            raise DeviceImportError("CSV 表头需包含 name 和 rtsp_url 两列")
+        reader.fieldnames = fields
+        # 表头是第 1 行
+        items = [(reader.line_num, row) for row in reader]
+
+    return [
+        {
+            "row": row,
+            "name": str(item.get("name") or "").strip(),
+            "rtsp_url": str(item.get("rtsp_url") or "").strip(),
+        }
+        for row, item in items
+    ]
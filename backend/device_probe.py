@@ -0,0 +1,116 @@
+"""设备视频流探测
+
+打开 RTSP 流可能阻塞到网络超时，每次探测在独立的子进程中执行，不占用事件循环；
+OpenCV 的 FFmpeg 后端在同一进程内打开视频流是串行的，子进程才能真正并发探测。
+OpenCV 的打开和读取超时之外再加一层整体超时，到期直接结束子进程并视为不可达。
+探测结果（是否可达、分辨率、帧率、编码和检查时间）缓存在 Device 表中，后台定期刷新。
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import select
+
+from database import async_session
+from models import Device
+
+logger = logging.getLogger(__name__)
+
+# 探测子进程执行的脚本，只导入 cv2，启动开销小
+_PROBE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stream_probe.py")
+# 子进程启动并导入 cv2 所需的额外时间（秒）
+_STARTUP_GRACE = 3.0
+
+
+class DeviceProber:
+    """在子进程中探测设备视频流，并定期刷新 Device 表中的缓存"""
+
+    def __init__(self, timeout: float = 5.0, concurrency: int = 4, interval: float = 300.0):
+        self.timeout = timeout
+        self.interval = interval
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, is_active: Callable[[int], bool]):
+        """启动后台刷新，is_active(device_id) 为 True 的设备正在采集，不再额外打开连接"""
+        self._task = asyncio.create_task(self._run(is_active))
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def probe(self, url: str) -> dict:
+        """探测视频流，打开和读取各自最多 timeout 秒，超出整体期限时结束子进程"""
+        async with self._semaphore:
+            process = None
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, _PROBE_SCRIPT, url, str(self.timeout),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+                stdout, _ = await asyncio.wait_for(process.communicate(), self.timeout * 2 + _STARTUP_GRACE)
+                result = json.loads(stdout)
+            except asyncio.TimeoutError:
+                result = {"reachable": False, "error": "连接视频流超时"}
+            except Exception as e:
+                logger.error(f"Error probing stream {url}: {str(e)}")
+                result = {"reachable": False, "error": str(e)}
+            finally:
+                if process is not None and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+        result["checked_at"] = datetime.utcnow()
+        return result
+
+    async def probe_device(self, device: Device) -> dict:
+        """探测设备并把结果写入 device 对象，由调用方提交"""
+        result = await self.probe(device.rtsp_url)
+        apply_probe(device, result)
+        return result
+
+    async def refresh(self, is_active: Callable[[int], bool]):
+        """并发探测所有设备（同时进行的探测数受 concurrency 限制），每个设备探测完成后单独写入结果"""
+        async with async_session() as session:
+            devices = (await session.execute(select(Device.id, Device.rtsp_url))).all()
+        await asyncio.gather(*(self._refresh_device(device_id, url, is_active) for device_id, url in devices))
+
+    async def _refresh_device(self, device_id: int, url: str, is_active: Callable[[int], bool]):
+        try:
+            if is_active(device_id):
+                # 共享采集正在持续出帧，只更新可达状态
+                result = {"reachable": True, "checked_at": datetime.utcnow()}
+            else:
+                result = await self.probe(url)
+            # 探测期间不占用数据库连接，写入时设备已删除或地址已变更则丢弃结果
+            async with async_session() as session:
+                device = await session.get(Device, device_id)
+                if device is None or device.rtsp_url != url:
+                    return
+                apply_probe(device, result)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error refreshing device {device_id}: {str(e)}")
+
+    async def _run(self, is_active: Callable[[int], bool]):
+        while True:
+            try:
+                await self.refresh(is_active)
+            except Exception as e:
+                logger.error(f"Error refreshing device streams: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+def apply_probe(device: Device, result: dict):
+    """把探测结果写入设备的缓存字段，不可达时保留上次的分辨率等信息"""
+    device.stream_reachable = result["reachable"]
+    device.stream_checked_at = result["checked_at"]
+    if result["reachable"]:
+        for field in ("width", "height", "fps", "codec"):
+            if field in result:
+                setattr(device, f"stream_{field}", result[field])
+
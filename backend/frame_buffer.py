@@ -0,0 +1,266 @@
+"""基于共享内存的帧环形缓冲区
+
+工作进程把帧写入 multiprocessing.shared_memory 中的固定槽位，并通过管道写入一个字节唤醒读端；
+API 进程在事件循环中监听管道，按序号读取最新帧，整个过程不需要 pickle，也不占用线程池。
+设备采集等由其他进程中的多个读取方轮询序号的缓冲区不创建唤醒管道。
+原始帧超出槽位容量时（如摄像头分辨率变化），写入方按该帧大小创建新的共享内存并在旧缓冲区中记录其名称，
+读写双方在下次访问时自动切换过去，已附加的进程无需重新附加。
+"""
+import asyncio
+import logging
+import os
+import struct
+import time
+from multiprocessing import Pipe, shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 缓冲区头部: 最新写入序号, 槽位数量, 槽位容量
+_HEADER = struct.Struct("<QII")
+# 槽位头部: 序号, 时间戳, 数据长度, 高, 宽, 通道数（编码后的数据三者为 0）
+_SLOT_HEADER = struct.Struct("<QdIHHH")
+# 头部之后记录替代本缓冲区的共享内存名称，为空表示仍在使用
+_SUCCESSOR = struct.Struct("32s")
+_DATA_OFFSET = _HEADER.size + _SUCCESSOR.size
+
+
+class FramePacket(NamedTuple):
+    seq: int
+    timestamp: float
+    data: bytes
+    shape: Tuple[int, ...]
+
+    def to_array(self) -> np.ndarray:
+        """将原始帧数据还原为图像数组（与 data 共享内存，可直接写入）"""
+        return np.frombuffer(self.data, dtype=np.uint8).reshape(self.shape)
+
+
+def _create_shm(seq: int, slots: int, slot_size: int) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=_DATA_OFFSET + slots * (_SLOT_HEADER.size + slot_size))
+    _HEADER.pack_into(shm.buf, 0, seq, slots, slot_size)
+    return shm
+
+
+class SharedFrameBuffer:
+    """单写多读的共享内存环形缓冲区
+
+    创建方（API 进程）负责释放共享内存；写入方（工作进程）通过 pickle 传入的句柄附加到同一块内存。
+    读取方按序号判断是否有新帧，槽位被覆盖时自动重试，因此慢读者只会跳帧而不会阻塞写入方。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, notify_w=None, notify_r=None, owner: bool = False):
+        self._shm = shm
+        self._notify_w = notify_w
+        self._notify_r = notify_r
+        self._owner = owner
+        self._closed = False
+        self._name = shm.name
+        # 已被替代的共享内存，创建方在 close() 时一并删除
+        self._retired = []
+        self._load_header()
+        self._event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        if notify_w is not None:
+            os.set_blocking(notify_w.fileno(), False)
+
+    @classmethod
+    def create(cls, slots: int, slot_size: int, notify: bool = True) -> "SharedFrameBuffer":
+        """创建新的缓冲区，调用方负责在结束时 close()
+
+        notify 为 True 时创建唤醒管道，供创建方在事件循环中用 read_async 等待；
+        读取方都在其他进程中用 wait 轮询时传 False，写入方不再写入无人读取的管道。
+        """
+        shm = _create_shm(0, slots, slot_size)
+        if not notify:
+            return cls(shm, owner=True)
+        notify_r, notify_w = Pipe(duplex=False)
+        return cls(shm, notify_w=notify_w, notify_r=notify_r, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, notify_w=None) -> "SharedFrameBuffer":
+        """按名称附加到已存在的缓冲区"""
+        return cls(shared_memory.SharedMemory(name=name), notify_w=notify_w)
+
+    def __reduce__(self):
+        # 传给子进程时只携带共享内存名称和唤醒管道的写端
+        self._follow()
+        return (SharedFrameBuffer.attach, (self._shm.name, self._notify_w))
+
+    @property
+    def name(self) -> str:
+        """附加时使用的名称，缓冲区被替代后保持不变，可作为标识"""
+        return self._name
+
+    def _load_header(self):
+        _, self.slots, self.slot_size = _HEADER.unpack_from(self._shm.buf, 0)
+        self._stride = _SLOT_HEADER.size + self.slot_size
+
+    def _follow(self):
+        """缓冲区已被替代时切换到最新的共享内存"""
+        while True:
+            successor = _SUCCESSOR.unpack_from(self._shm.buf, _HEADER.size)[0].rstrip(b"\0")
+            if not successor:
+                return
+            self._switch(shared_memory.SharedMemory(name=successor.decode()))
+
+    def _switch(self, shm: shared_memory.SharedMemory):
+        if self._owner:
+            self._retired.append(self._shm)
+        else:
+            self._shm.close()
+        self._shm = shm
+        self._load_header()
+
+    def _grow(self, slot_size: int):
+        """按新的槽位容量创建替代的缓冲区，帧序号接续原缓冲区"""
+        shm = _create_shm(self.latest_seq(), self.slots, slot_size)
+        _SUCCESSOR.pack_into(self._shm.buf, _HEADER.size, shm.name.encode())
+        logger.info(f"Frame buffer {self._shm.name} replaced by {shm.name} with slot size {slot_size}")
+        self._switch(shm)
+
+    def _slot_offset(self, seq: int) -> int:
+        return _DATA_OFFSET + (seq % self.slots) * self._stride
+
+    def latest_seq(self) -> int:
+        """返回最新写入的帧序号，0 表示尚未写入"""
+        return _HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def latest_timestamp(self) -> Optional[float]:
+        """返回最新一帧的写入时间，不复制帧数据"""
+        self._follow()
+        seq = self.latest_seq()
+        if seq == 0:
+            return None
+        return _SLOT_HEADER.unpack_from(self._shm.buf, self._slot_offset(seq))[1]
+
+    def write(self, data, timestamp: Optional[float] = None, shape: Tuple[int, ...] = ()) -> Optional[int]:
+        """写入一帧数据并唤醒读端，数据超出槽位容量时丢弃并返回 None"""
+        self._follow()
+        view = memoryview(data).cast("B")
+        length = view.nbytes
+        if length > self.slot_size:
+            logger.warning(f"Frame of {length} bytes exceeds slot size {self.slot_size}, dropped")
+            return None
+
+        seq = self.latest_seq() + 1
+        offset = self._slot_offset(seq)
+        height, width, channels = (tuple(shape) + (0, 0, 0))[:3]
+        # 先把槽位序号清零，读端据此识别正在写入的槽位
+        _SLOT_HEADER.pack_into(self._shm.buf, offset, 0, 0.0, 0, 0, 0, 0)
+        start = offset + _SLOT_HEADER.size
+        self._shm.buf[start:start + length] = view
+        _SLOT_HEADER.pack_into(
+            self._shm.buf, offset,
+            seq, timestamp if timestamp is not None else time.time(), length, height, width, channels
+        )
+        _HEADER.pack_into(self._shm.buf, 0, seq, self.slots, self.slot_size)
+        self._notify()
+        return seq
+
+    def write_array(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Optional[int]:
+        """写入一帧原始图像，超出槽位容量时换用按该帧大小创建的缓冲区"""
+        frame = np.ascontiguousarray(frame)
+        self._follow()
+        if frame.nbytes > self.slot_size:
+            self._grow(frame.nbytes)
+        return self.write(frame, timestamp=timestamp, shape=frame.shape)
+
+    def _notify(self):
+        if self._notify_w is None:
+            return
+        try:
+            os.write(self._notify_w.fileno(), b"\x00")
+        except (BlockingIOError, BrokenPipeError):
+            # 管道已满说明读端尚未消费上一次唤醒，丢弃即可
+            pass
+
+    def read(self, after_seq: int = 0) -> Optional[FramePacket]:
+        """读取序号大于 after_seq 的最新一帧，没有新帧时返回 None"""
+        self._follow()
+        for _ in range(3):
+            seq = self.latest_seq()
+            if seq <= after_seq:
+                return None
+            offset = self._slot_offset(seq)
+            slot_seq, timestamp, length, height, width, channels = _SLOT_HEADER.unpack_from(self._shm.buf, offset)
+            if slot_seq != seq:
+                continue
+            start = offset + _SLOT_HEADER.size
+            shape = tuple(d for d in (height, width, channels) if d)
+            # 原始图像复制为可写的 bytearray，便于消费方直接在帧上绘制
+            copy = bytearray if shape else bytes
+            data = copy(self._shm.buf[start:start + length])
+            # 复制期间槽位被覆盖则重读
+            if _SLOT_HEADER.unpack_from(self._shm.buf, offset)[0] != seq:
+                continue
+            return FramePacket(seq, timestamp, data, shape)
+        return None
+
+    def wait(self, after_seq: int = 0, timeout: Optional[float] = None, interval: float = 0.005) -> Optional[FramePacket]:
+        """在其他进程中轮询等待新帧，超时返回 None；唤醒管道只有创建方一个读端，多个读取方无法共用"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            packet = self.read(after_seq)
+            if packet is not None:
+                return packet
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+
+    def _on_readable(self):
+        try:
+            while os.read(self._notify_r.fileno(), 4096):
+                pass
+        except BlockingIOError:
+            pass
+        if self._event is not None:
+            self._event.set()
+            self._event = asyncio.Event()
+
+    def _ensure_reader(self) -> asyncio.Event:
+        if self._notify_r is None:
+            raise RuntimeError("Only the creating process can wait on a frame buffer")
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            os.set_blocking(self._notify_r.fileno(), False)
+            self._event = asyncio.Event()
+            self._loop.add_reader(self._notify_r.fileno(), self._on_readable)
+        return self._event
+
+    async def read_async(self, after_seq: int = 0, timeout: Optional[float] = None) -> FramePacket:
+        """在事件循环中等待序号大于 after_seq 的新帧，超时抛出 asyncio.TimeoutError"""
+        while True:
+            if self._closed:
+                raise RuntimeError("Frame buffer closed")
+            packet = self.read(after_seq)
+            if packet is not None:
+                return packet
+            event = self._ensure_reader()
+            await asyncio.wait_for(event.wait(), timeout)
+
+    def close(self):
+        """释放缓冲区，创建方同时删除共享内存"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._event is not None:
+            self._event.set()
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self._notify_r.fileno())
+        for conn in (self._notify_r, self._notify_w):
+            if conn is not None:
+                conn.close()
+        try:
+            self._follow()
+        except FileNotFoundError:
+            pass
+        for shm in self._retired + [self._shm]:
+            shm.close()
+            if self._owner:
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
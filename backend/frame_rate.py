@@ -0,0 +1,32 @@
+"""按时间戳选帧
+
+监控任务的分析帧率和画面发送帧率与摄像头帧率无关：按帧的采集时间每 1/fps 秒选取一帧，
+两次选取之间工作进程不必读取和复制中间的帧，到时直接取最新一帧。
+"""
+from typing import Optional
+
+
+class FrameRate:
+    """每 1/fps 秒选取一帧，fps 为 0 或 None 时每帧都选取"""
+
+    def __init__(self, fps: Optional[float] = None):
+        self.fps = fps or 0.0
+        self.interval = 1.0 / fps if fps else 0.0
+        self._next_at = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """距离下一次选取还需等待的秒数"""
+        return max(self._next_at - now, 0.0)
+
+    def due(self, timestamp: float) -> bool:
+        """采集时间为 timestamp 的帧是否应当选取，选取时推进下一次的时间"""
+        if not self.interval:
+            return True
+        if timestamp < self._next_at:
+            return False
+        # 按计划时间推进以保持平均帧率；落后超过一个间隔时从当前帧重新计时，不做追赶
+        if timestamp - self._next_at < self.interval:
+            self._next_at += self.interval
+        else:
+            self._next_at = timestamp + self.interval
+        return True
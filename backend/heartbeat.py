@@ -0,0 +1,85 @@
+"""监控工作进程的心跳
+
+工作进程每轮循环写入一次心跳时间，每处理完一帧再更新帧数、帧率和最近一帧的时间，
+API 进程的看门狗只读取共享内存就能判断工作进程是卡死（心跳停止）还是拿不到画面（帧停止）。
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+# 心跳时间, 已处理帧数, 当前帧率, 最近一帧的处理时间
+_HEARTBEAT = struct.Struct("<dQdd")
+
+# 帧率按此间隔（秒）取样并做指数平滑
+_FPS_INTERVAL = 1.0
+_FPS_SMOOTHING = 0.3
+
+
+class Heartbeat:
+    """单个监控任务的心跳，创建方（API 进程）负责释放共享内存"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        self._shm = shm
+        self._owner = owner
+        self._closed = False
+        # 写入方在本进程内记录上次取样的 (时间, 帧数)
+        self._sample: Optional[tuple] = None
+
+    @classmethod
+    def create(cls) -> "Heartbeat":
+        shm = shared_memory.SharedMemory(create=True, size=_HEARTBEAT.size)
+        heartbeat = cls(shm, owner=True)
+        heartbeat.reset()
+        return heartbeat
+
+    @classmethod
+    def attach(cls, name: str) -> "Heartbeat":
+        return cls(shared_memory.SharedMemory(name=name))
+
+    def __reduce__(self):
+        return (Heartbeat.attach, (self._shm.name,))
+
+    def reset(self):
+        """重新启动工作进程前调用，心跳时间从现在算起"""
+        _HEARTBEAT.pack_into(self._shm.buf, 0, time.time(), 0, 0.0, 0.0)
+        self._sample = None
+
+    def beat(self):
+        """工作进程仍在循环中，即使暂时没有拿到新帧"""
+        _, frames, fps, last_frame_at = _HEARTBEAT.unpack_from(self._shm.buf, 0)
+        _HEARTBEAT.pack_into(self._shm.buf, 0, time.time(), frames, fps, last_frame_at)
+
+    def frame(self):
+        """处理完一帧，更新帧数并按取样间隔更新帧率"""
+        _, frames, fps, _ = _HEARTBEAT.unpack_from(self._shm.buf, 0)
+        frames += 1
+        now = time.monotonic()
+        if self._sample is None:
+            self._sample = (now, frames)
+        elif now - self._sample[0] >= _FPS_INTERVAL:
+            current = (frames - self._sample[1]) / (now - self._sample[0])
+            fps = current if fps == 0 else fps + _FPS_SMOOTHING * (current - fps)
+            self._sample = (now, frames)
+        timestamp = time.time()
+        _HEARTBEAT.pack_into(self._shm.buf, 0, timestamp, frames, fps, timestamp)
+
+    def snapshot(self) -> dict:
+        beat_at, frames, fps, last_frame_at = _HEARTBEAT.unpack_from(self._shm.buf, 0)
+        return {
+            "beat_at": beat_at,
+            "frames": frames,
+            "fps": round(fps, 2),
+            "last_frame_at": last_frame_at or None,
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
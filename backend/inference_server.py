@@ -0,0 +1,290 @@
+"""按算法共享的动态批处理推理服务
+
+每个算法（即每个权重文件）只启动一个推理进程。各路视频流的工作进程把帧写入各自的共享内存缓冲区，
+通过与推理进程之间的专用管道提交帧序号；推理进程在最大批大小和最长等待时间内尽量凑批，
+一次前向计算多路摄像头的帧，再把检测结果沿管道发回各工作进程。
+"""
+import logging
+import multiprocessing
+import time
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+import reaper
+from detections import boxes_to_array, draw_detections, log_results
+from frame_buffer import SharedFrameBuffer
+from model_cache import model_cache
+
+logger = logging.getLogger(__name__)
+
+
+def run_inference_server(
+    algorithm_id: int,
+    weight_path: str,
+    control: Connection,
+    max_batch: int,
+    max_wait: float
+):
+    """推理进程：从各客户端管道凑批并执行批量推理
+
+    控制管道接收 ("attach", 客户端管道, 输入缓冲区名称)、("detach", 输入缓冲区名称) 以及停止信号 None。
+    """
+    logging.basicConfig(level=logging.INFO)
+    model = model_cache.get(weight_path)
+    logger.info(f"Inference server for algorithm {algorithm_id} ready with {weight_path}")
+
+    # 输入缓冲区名称 -> (客户端管道, 输入缓冲区)
+    clients: Dict[str, tuple] = {}
+
+    def attach(conn: Connection, input_name: str):
+        detach(input_name)
+        try:
+            clients[input_name] = (conn, SharedFrameBuffer.attach(input_name))
+        except FileNotFoundError:
+            conn.close()
+
+    def detach(input_name: str):
+        client = clients.pop(input_name, None)
+        if client is not None:
+            client[0].close()
+            client[1].close()
+
+    running = True
+    try:
+        while running:
+            batch = []
+            deadline = None
+            while running:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                names = {conn: name for name, (conn, _) in clients.items()}
+                for conn in wait([control, *names], timeout):
+                    if conn is control:
+                        message = control.recv()
+                        if message is None:
+                            running = False
+                        elif message[0] == "attach":
+                            attach(message[1], message[2])
+                        elif message[0] == "detach":
+                            detach(message[1])
+                        continue
+                    try:
+                        seq, want_names = conn.recv()
+                    except (EOFError, OSError):
+                        detach(names[conn])
+                        continue
+                    batch.append((names[conn], seq, want_names))
+                    if deadline is None:
+                        deadline = time.monotonic() + max_wait
+                if batch and (len(batch) >= max_batch or time.monotonic() >= deadline):
+                    break
+            if not batch:
+                continue
+
+            frames, targets = [], []
+            for input_name, seq, want_names in batch:
+                if input_name not in clients:
+                    continue
+                conn, input_buffer = clients[input_name]
+                packet = input_buffer.read(seq - 1)
+                # 客户端只在收到结果后才写入下一帧，序号不一致说明请求已过期
+                if packet is None or packet.seq != seq:
+                    continue
+                frames.append(packet.to_array())
+                targets.append((conn, seq, want_names))
+            if not frames:
+                continue
+
+            try:
+                # 权重文件被替换时缓存会按新哈希重新加载
+                model = model_cache.get(weight_path)
+                results = model(frames, verbose=False)
+                outputs = [(boxes_to_array(result.boxes), None) for result in results]
+            except Exception as e:
+                logger.error(f"Batch inference failed for algorithm {algorithm_id}: {str(e)}")
+                outputs = [(None, str(e))] * len(frames)
+
+            for (conn, seq, want_names), (detections, error) in zip(targets, outputs):
+                try:
+                    conn.send((seq, detections, model.names if want_names else None, error))
+                except OSError:
+                    pass
+    except Exception as e:
+        logger.error(f"Error in inference server for algorithm {algorithm_id}: {str(e)}")
+    finally:
+        for input_name in list(clients):
+            detach(input_name)
+        logger.info(f"Inference server for algorithm {algorithm_id} stopped")
+
+
+class InferenceClient:
+    """工作进程侧的推理客户端，接口与 VideoProcessor 保持一致
+
+    客户端只包含管道和共享内存缓冲区，可以直接发送给已启动的工作进程。
+    """
+
+    def __init__(self, conn: Connection, input_buffer: SharedFrameBuffer):
+        self.conn = conn
+        self.input_buffer = input_buffer
+        self.names: Optional[Dict[int, str]] = None
+
+    def process_frame(self, frame: np.ndarray, plot: bool = True, timeout: float = 30.0):
+        """提交单帧并等待推理结果，plot 为 False 时不在帧上绘制检测框"""
+        try:
+            seq = self.input_buffer.write_array(frame)
+            self.conn.send((seq, self.names is None))
+
+            deadline = time.monotonic() + timeout
+            while True:
+                if not self.conn.poll(max(deadline - time.monotonic(), 0)):
+                    raise Exception("推理服务响应超时")
+                result_seq, detections, names, error = self.conn.recv()
+                # 丢弃此前超时请求迟到的结果
+                if result_seq == seq:
+                    break
+
+            if error:
+                raise Exception(error)
+            if names:
+                self.names = names
+            return {
+                'success': True,
+                'frame': draw_detections(frame, detections, self.names) if plot else frame,
+                'boxes': detections,
+                'num_objects': len(detections)
+            }
+        except Exception as e:
+            logger.error(f"Error processing frame: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def log_results(self, results, log_file, frame_count=None, total_frames=None):
+        """记录处理结果到日志"""
+        log_results(results, log_file, frame_count, total_frames)
+
+
+class _Client:
+    def __init__(self, client: InferenceClient, server_conn: Connection):
+        self.client = client
+        # 保留推理进程一端，推理进程重启后重新下发，管道中未处理的请求不会丢失
+        self.server_conn = server_conn
+
+    def close(self):
+        self.client.conn.close()
+        self.server_conn.close()
+        self.client.input_buffer.close()
+
+
+class _Server:
+    def __init__(self, weight_path: str, control: Connection, process: BaseProcess):
+        self.weight_path = weight_path
+        self.control = control
+        self.process = process
+        self.clients: Dict[Hashable, _Client] = {}
+        self.idle_since: Optional[float] = None
+
+
+class InferenceService:
+    """管理各算法的推理进程，以使用方（监控任务）为单位做引用计数
+
+    最后一个使用方释放后推理进程继续保持模型常驻 idle_timeout 秒，期间再次启动监控无需重新加载模型。
+    """
+
+    def __init__(self, max_batch: int, max_wait: float, idle_timeout: float = 0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.idle_timeout = idle_timeout
+        # 与工作进程池共用 forkserver，推理进程不继承 API 进程的线程、事件循环和信号处理函数，
+        # 也不会继承 API 进程中可能已初始化的 CUDA 状态
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._servers: Dict[int, _Server] = {}
+
+    def acquire(self, algorithm_id: int, weight_path: str, consumer: Hashable) -> InferenceClient:
+        """为使用方创建连接到算法推理进程的客户端，必要时启动推理进程"""
+        self.release(consumer)
+        self.reap_idle()
+        # 先创建共享内存再启动推理进程，确保子进程与本进程共用同一个资源跟踪器；
+        # 槽位容量由客户端按实际提交的帧（裁剪后的监控区域或原始画面）大小确定
+        # 推理进程按管道中提交的帧序号读取，不需要缓冲区的唤醒管道
+        input_buffer = SharedFrameBuffer.create(2, 0, notify=False)
+
+        server = self._servers.get(algorithm_id)
+        if server is not None and (not server.process.is_alive() or server.weight_path != weight_path):
+            # 推理进程异常退出或权重已变更，重启后重新挂载已有客户端
+            server.process.terminate()
+            reaper.reap(server.process)
+            server.control.close()
+            server.weight_path = weight_path
+            server.control, server.process = self._spawn(algorithm_id, weight_path)
+            for handle in server.clients.values():
+                server.control.send(("attach", handle.server_conn, handle.client.input_buffer.name))
+        elif server is None:
+            server = _Server(weight_path, *self._spawn(algorithm_id, weight_path))
+            self._servers[algorithm_id] = server
+
+        client_conn, server_conn = Pipe()
+        server.control.send(("attach", server_conn, input_buffer.name))
+        client = InferenceClient(client_conn, input_buffer)
+        server.clients[consumer] = _Client(client, server_conn)
+        server.idle_since = None
+        logger.info(f"Inference server for algorithm {algorithm_id} acquired by {consumer}, clients={len(server.clients)}")
+        return client
+
+    def release(self, consumer: Hashable):
+        """释放使用方的客户端，算法无人使用且超过空闲时间后停止推理进程"""
+        for algorithm_id, server in list(self._servers.items()):
+            handle = server.clients.pop(consumer, None)
+            if handle is None:
+                continue
+            try:
+                server.control.send(("detach", handle.client.input_buffer.name))
+            except OSError:
+                pass
+            handle.close()
+            logger.info(f"Inference server for algorithm {algorithm_id} released by {consumer}, clients={len(server.clients)}")
+            if not server.clients:
+                server.idle_since = time.monotonic()
+        self.reap_idle()
+
+    def reap_idle(self):
+        """停止空闲超时的推理进程"""
+        now = time.monotonic()
+        for algorithm_id, server in list(self._servers.items()):
+            if server.idle_since is not None and now - server.idle_since >= self.idle_timeout:
+                self._stop(algorithm_id)
+
+    def stop_all(self):
+        for algorithm_id in list(self._servers):
+            self._stop(algorithm_id)
+
+    def _spawn(self, algorithm_id: int, weight_path: str):
+        control, child_control = Pipe()
+        process = self._ctx.Process(target=run_inference_server, args=(
+            algorithm_id,
+            weight_path,
+            child_control,
+            self.max_batch,
+            self.max_wait
+        ))
+        process.start()
+        child_control.close()
+        return control, process
+
+    def _stop(self, algorithm_id: int):
+        server = self._servers.pop(algorithm_id, None)
+        if server is None:
+            return
+        try:
+            server.control.send(None)
+        except OSError:
+            pass
+        # 等待推理进程处理完停止信号自行退出，超时再强制结束，不阻塞事件循环
+        reaper.reap(server.process, grace=5)
+        server.control.close()
+        for handle in server.clients.values():
+            handle.close()
@@ -0,0 +1,60 @@
+"""任务日志的增量读取
+
+客户端记住上次读到的字节偏移，之后只读取偏移之后新增的完整行，读取开销与日志总大小无关。
+日志被重写（任务重新启动）后文件变短，此时从头开始读取并通知客户端重置。
+"""
+import asyncio
+import os
+from typing import AsyncIterator, Optional, Tuple
+
+
+def read_log(path: str, offset: Optional[int] = None, max_bytes: int = 64 * 1024) -> Tuple[str, int, bool]:
+    """读取 offset 之后最多 max_bytes 字节的完整行
+
+    offset 为 None 时返回日志末尾 max_bytes 字节内的完整行。返回 (文本, 下次读取的偏移, 是否重置)。
+    """
+    if not os.path.exists(path):
+        return "", 0, offset is not None and offset > 0
+    size = os.path.getsize(path)
+    reset = False
+    tail = offset is None
+    if offset is None:
+        offset = max(size - max_bytes, 0)
+    elif offset > size:
+        offset, reset = 0, True
+    if offset >= size:
+        return "", offset, reset
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+    start = 0
+    if tail and offset > 0:
+        # 从末尾截取时跳过第一行的残余部分
+        start = data.find(b"\n") + 1
+    # 只返回完整的行，未写完的行留到下次读取
+    end = data.rfind(b"\n") + 1
+    if end <= start:
+        if len(data) == max_bytes and not tail:
+            # 单行超过 max_bytes 时按原样返回，避免卡住
+            end = len(data)
+        else:
+            return "", offset + start, reset
+    return data[start:end].decode("utf-8", errors="replace"), offset + end, reset
+
+
+async def follow_log(
+    path: str,
+    offset: Optional[int] = None,
+    interval: float = 0.5,
+    max_bytes: int = 64 * 1024
+) -> AsyncIterator[Tuple[str, int, bool]]:
+    """持续产出日志新增内容，追上文件末尾后每 interval 秒检查一次"""
+    while True:
+        text, next_offset, reset = read_log(path, offset, max_bytes)
+        if text or reset:
+            yield text, next_offset, reset
+        caught_up = not text
+        offset = next_offset
+        if caught_up:
+            await asyncio.sleep(interval)
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, Depends, status, Request, WebSocket, WebSocketDisconnect
 from fastapi import UploadFile, File, Form
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -10,7 +10,6 @@ import jwt
 import bcrypt
 from datetime import datetime, timedelta
 from settings import settings
-import cv2
 import numpy as np
 import asyncio
 import json
@@ -18,19 +17,30 @@ import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database import get_session, init_db, async_session
-from models import User, Device, Algorithm, Task, TestTask, MonitorTask
+from models import User, Device, Algorithm, Task, TestTask, MonitorTask, MonitorDowntime
 from contextlib import asynccontextmanager
-from schemas import UserCreate, DeviceResponse, DeviceCreate, AlgorithmResponse, AlgorithmCreate, TaskResponse, TaskCreate, TestTaskCreate, TestTaskResponse
+from schemas import UserCreate, DeviceResponse, DeviceCreate, AlgorithmResponse, TaskResponse, TaskCreate, TaskUpdate, RoiUpdate, TestTaskCreate, TestTaskResponse
 import os
 import shutil
-from asyncio import Queue, create_task
-from pathlib import Path
-from multiprocessing import Process, Queue
-from queue import Empty, Full
 import time
-from asyncio import Queue as AsyncQueue
 from functools import partial
-from multiprocessing import Event
+from stream_tiers import TieredFrameBuffer, TierController, load_tiers
+from stream_hub import StreamHub, StreamClosed, Subscriber
+from passthrough import PassthroughService, PassthroughStream
+from capture_service import CaptureService
+from inference_server import InferenceService
+from worker_pool import WorkerPool
+import reaper
+from detection_store import detections_dir, frame_range, query_detections
+from log_tail import read_log, follow_log
+from progress import ProgressCounter
+from supervisor import TaskSupervisor
+from stream_watchdog import StreamWatchdog
+from motion_gate import MotionGate
+from roi import RegionOfInterest
+from device_probe import DeviceProber, apply_probe
+from device_import import DeviceImportError, parse_device_file
+from workers import process_video_task, process_stream_task, process_device_preview, LAST_FRAME_MARK
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -40,18 +50,150 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时执行
+    maintenance = None
+    resume = None
     try:
         logger.info("Starting application...")
+        # 创建新增的数据表，已有的表不受影响
+        await init_db()
+        # forkserver 首次启动需导入 torch 等模块，放到线程中避免阻塞事件循环
+        await asyncio.get_event_loop().run_in_executor(None, worker_pool.start)
+        maintenance = asyncio.create_task(maintain_workers())
+        supervisor.start()
+        stream_watchdog.start()
+        resume = asyncio.create_task(resume_monitors())
+        device_prober.start(capture_service.is_active)
         yield
     finally:
         # 关闭时执行
         logger.info("Shutting down...")
         # 清理资源
-        for process in process_dict.values():
-            process.terminate()
-            process.join()
-        process_dict.clear()
-        queue_dict.clear()
+        if resume is not None:
+            resume.cancel()
+        await record_monitor_shutdown()
+        device_prober.shutdown()
+        stream_watchdog.shutdown()
+        await supervisor.shutdown()
+        if maintenance is not None:
+            maintenance.cancel()
+        # 等待工作进程退出，放到线程中执行
+        await asyncio.get_event_loop().run_in_executor(None, worker_pool.shutdown)
+        inference_service.stop_all()
+        capture_service.stop_all()
+        # 等待后台回收的推理和采集进程退出
+        await asyncio.get_event_loop().run_in_executor(None, reaper.wait_all)
+        stream_hub.close_all()
+        await passthrough_service.close_all()
+        for frame_buffer in buffer_dict.values():
+            frame_buffer.close()
+        buffer_dict.clear()
+        for progress in progress_dict.values():
+            progress.close()
+        progress_dict.clear()
+
+async def resume_monitors():
+    """启动时重新拉起数据库中标记为运行中的监控任务，并记录每路画面的中断时长
+
+    按算法排序逐个间隔启动，同一算法的监控任务复用已加载模型的推理进程，避免同时加载模型和连接摄像头。
+    """
+    try:
+        async with async_session() as session:
+            result = await session.execute(
+                select(MonitorTask, Task, Device, Algorithm)
+                .join(Task, MonitorTask.task_id == Task.id)
+                .join(Device, Task.device_id == Device.id)
+                .join(Algorithm, Task.algorithm_id == Algorithm.id)
+                .where(MonitorTask.status == "running")
+                .order_by(Algorithm.id, MonitorTask.id)
+            )
+            monitors = result.all()
+            result = await session.execute(
+                select(MonitorDowntime).where(MonitorDowntime.resumed_at.is_(None))
+            )
+            # 同一监控可能有多条未关闭的记录（例如连续多次异常退出），恢复时全部关闭
+            open_downtimes: Dict[int, List[MonitorDowntime]] = {}
+            for downtime in result.scalars():
+                open_downtimes.setdefault(downtime.monitor_id, []).append(downtime)
+    except Exception as e:
+        logger.error(f"Error loading monitors to resume: {str(e)}")
+        return
+    if not monitors:
+        return
+    logger.info(f"Resuming {len(monitors)} monitor task(s)")
+
+    resumed = []
+    for index, (monitor, task, device, algorithm) in enumerate(monitors):
+        if task.status != "running":
+            supervisor.queue_update(MonitorTask, monitor.id, status="stopped")
+            continue
+        if index:
+            await asyncio.sleep(settings.MONITOR_RESUME_STAGGER)
+        # 服务异常退出时没有关闭记录，以工作进程最后记录的处理一帧的时间作为中断时间
+        downtimes = open_downtimes.get(monitor.id)
+        if not downtimes:
+            mark_file = os.path.join(RESULTS_DIR, f"task_{task.id}", LAST_FRAME_MARK)
+            started_at = datetime.utcfromtimestamp(os.path.getmtime(mark_file)) if os.path.exists(mark_file) else None
+            downtimes = [MonitorDowntime(monitor_id=monitor.id, reason="crash", started_at=started_at)]
+        try:
+            _launch_monitor(
+                monitor.id, task.id, device.id, device.rtsp_url, algorithm.id, algorithm.weight_path,
+                _monitor_options(task, device), resume=True
+            )
+        except Exception as e:
+            logger.error(f"Error resuming monitor {monitor.id}: {str(e)}")
+            queue_key = f"monitor_{monitor.id}"
+            supervisor.stop(queue_key)
+            _release_monitor(queue_key)
+            supervisor.queue_update(MonitorTask, monitor.id, status="stopped")
+            continue
+        resumed_at = datetime.utcnow()
+        for downtime in downtimes:
+            downtime.resumed_at = resumed_at
+        resumed.extend(downtimes)
+
+    # 等待各路画面恢复出帧，超时未出帧的由看门狗继续处理
+    deadline = time.monotonic() + settings.STREAM_FRAME_TIMEOUT
+    waiting = list(resumed)
+    while waiting and time.monotonic() < deadline:
+        await asyncio.sleep(1)
+        for downtime in list(waiting):
+            heartbeat = stream_watchdog.status(f"monitor_{downtime.monitor_id}")["heartbeat"]
+            if heartbeat and heartbeat["last_frame_at"]:
+                downtime.first_frame_at = datetime.utcfromtimestamp(heartbeat["last_frame_at"])
+                waiting.remove(downtime)
+
+    try:
+        async with async_session() as session:
+            for downtime in resumed:
+                if downtime.started_at is not None:
+                    await session.merge(downtime)
+            await session.commit()
+    except Exception as e:
+        logger.error(f"Error recording monitor downtime: {str(e)}")
+
+async def record_monitor_shutdown():
+    """关闭前为运行中的监控任务记录中断开始时间，下次启动恢复后补全"""
+    try:
+        async with async_session() as session:
+            result = await session.execute(
+                select(MonitorTask.id).where(MonitorTask.status == "running")
+            )
+            now = datetime.utcnow()
+            for monitor_id in result.scalars():
+                session.add(MonitorDowntime(monitor_id=monitor_id, reason="shutdown", started_at=now))
+            await session.commit()
+    except Exception as e:
+        logger.error(f"Error recording monitor shutdown: {str(e)}")
+
+async def maintain_workers():
+    """定期检查工作进程池健康状况并回收空闲的推理进程"""
+    while True:
+        await asyncio.sleep(settings.WORKER_HEALTH_CHECK_INTERVAL)
+        try:
+            worker_pool.health_check()
+            inference_service.reap_idle()
+        except Exception as e:
+            logger.error(f"Error maintaining workers: {str(e)}")
 
 # 创建 FastAPI 实例
 app = FastAPI(lifespan=lifespan)
@@ -59,10 +201,53 @@ app = FastAPI(lifespan=lifespan)
 # 存储 WebSocket 连接
 ws_connections: Dict[str, WebSocket] = {}
 
-# 存储进程
-process_dict: Dict[int, Process] = {}
-# 存储进程间通信的队列
-queue_dict: Dict[int, Queue] = {}
+# 统一管理所有任务进程，进程结束时回调并批量写入任务状态
+supervisor = TaskSupervisor(settings.SUPERVISOR_FLUSH_INTERVAL)
+# 存储进程间传递帧的共享内存缓冲区，每路流按清晰度档位各一个
+buffer_dict: Dict[int, TieredFrameBuffer] = {}
+stream_tiers = load_tiers(settings.STREAM_TIERS)
+# 存储测试任务的进度计数器
+progress_dict: Dict[int, ProgressCounter] = {}
+# 向同一路流的多个观看者广播帧
+stream_hub = StreamHub(
+    settings.STREAM_SUBSCRIBER_BUFFER,
+    lambda tier_count, index: TierController(
+        tier_count,
+        index,
+        settings.STREAM_TIER_MAX_DROPS,
+        settings.STREAM_TIER_WINDOW,
+        settings.STREAM_TIER_UP_AFTER
+    )
+)
+# 设备预览的 H.264 直通流，不解码直接转封装为 fMP4
+passthrough_service = PassthroughService(settings.PREVIEW_PASSTHROUGH_BUFFER, settings.PREVIEW_PASSTHROUGH_TIMEOUT)
+# 每个设备只解码一次，供预览和所有监控任务共享
+capture_service = CaptureService(settings.CAPTURE_BUFFER_SLOTS)
+# 每个算法一个推理进程，对多路摄像头的帧动态凑批推理
+inference_service = InferenceService(
+    settings.INFERENCE_MAX_BATCH,
+    settings.INFERENCE_MAX_WAIT,
+    settings.INFERENCE_IDLE_TIMEOUT
+)
+# 预启动的工作进程池，测试任务、监控任务和设备预览都在池中执行
+worker_pool = WorkerPool(settings.WORKER_POOL_SIZE, settings.WORKER_MAX_JOBS)
+# 检测卡死或断流的监控工作进程，按指数退避自动重启
+stream_watchdog = StreamWatchdog(
+    settings.STREAM_WATCHDOG_INTERVAL,
+    settings.STREAM_STALL_TIMEOUT,
+    settings.STREAM_FRAME_TIMEOUT,
+    settings.STREAM_RESTART_BACKOFF_BASE,
+    settings.STREAM_RESTART_BACKOFF_MAX,
+    settings.STREAM_RESTART_RESET
+)
+# 在子进程中探测设备视频流，结果缓存在设备表中
+device_prober = DeviceProber(
+    settings.DEVICE_PROBE_TIMEOUT,
+    settings.DEVICE_PROBE_CONCURRENCY,
+    settings.DEVICE_PROBE_INTERVAL
+)
+# 批量导入设备时使用更高的探测并发数
+import_prober = DeviceProber(settings.DEVICE_PROBE_TIMEOUT, settings.DEVICE_IMPORT_CONCURRENCY)
 
 # 添加 CORS 中间件
 app.add_middleware(
@@ -214,7 +399,8 @@ async def create_device(
         # 创建新设备
         db_device = Device(
             name=device.name,
-            rtsp_url=device.rtsp_url
+            rtsp_url=device.rtsp_url,
+            roi=device.roi
         )
         db.add(db_device)
         await db.commit()
@@ -227,6 +413,83 @@ async def create_device(
         logger.error(f"Error creating device: {str(e)}")
         raise HTTPException(status_code=500, detail="创建设备失败")
 
+@app.post("/devices/import")
+async def import_devices(
+    file: UploadFile = File(...),
+    probe: bool = True,
+    db: AsyncSession = Depends(get_session)
+):
+    """从 CSV 或 JSON 文件批量导入设备，并发探测视频流后在一个事务中写入，返回逐条结果"""
+    try:
+        rows = parse_device_file(file.filename or "", await file.read())
+    except DeviceImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not rows:
+        raise HTTPException(status_code=400, detail="文件中没有设备")
+    if len(rows) > settings.DEVICE_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"单次最多导入 {settings.DEVICE_IMPORT_MAX_ROWS} 个设备")
+    
+    try:
+        # 分批查询已存在的设备名称，避免超出 SQLite 的参数数量限制
+        names = list({row["name"] for row in rows if row["name"]})
+        existing = set()
+        for start in range(0, len(names), 500):
+            result = await db.execute(
+                select(Device.name).where(Device.name.in_(names[start:start + 500]))
+            )
+            existing.update(result.scalars())
+        
+        seen = set()
+        valid = []
+        for row in rows:
+            if not row["name"] or not row["rtsp_url"]:
+                row.update(status="invalid", error="缺少设备名称或RTSP地址")
+            elif row["name"] in existing:
+                row.update(status="skipped", error="设备名称已存在")
+            elif row["name"] in seen:
+                row.update(status="skipped", error="文件中设备名称重复")
+            else:
+                seen.add(row["name"])
+                valid.append(row)
+        devices = [Device(name=row["name"], rtsp_url=row["rtsp_url"]) for row in valid]
+        
+        # 并发探测，相同地址只探测一次
+        probes = {}
+        if probe and devices:
+            urls = list({device.rtsp_url for device in devices})
+            probes = dict(zip(urls, await asyncio.gather(*(import_prober.probe(url) for url in urls))))
+            for device in devices:
+                apply_probe(device, probes[device.rtsp_url])
+        
+        db.add_all(devices)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error importing devices: {str(e)}")
+        raise HTTPException(status_code=500, detail="批量导入设备失败")
+    
+    for row, device in zip(valid, devices):
+        row.update(
+            status="created",
+            id=device.id,
+            stream_reachable=device.stream_reachable,
+            stream_width=device.stream_width,
+            stream_height=device.stream_height,
+            stream_fps=device.stream_fps,
+            stream_codec=device.stream_codec
+        )
+        if device.stream_reachable is False:
+            row["error"] = probes[device.rtsp_url]["error"]
+    logger.info(f"Imported {len(devices)} of {len(rows)} device(s) from {file.filename}")
+    return {
+        "total": len(rows),
+        "created": len(devices),
+        "skipped": sum(row["status"] == "skipped" for row in rows),
+        "invalid": sum(row["status"] == "invalid" for row in rows),
+        "unreachable": sum(device.stream_reachable is False for device in devices),
+        "devices": rows,
+    }
+
 @app.get("/devices", response_model=list[DeviceResponse])
 async def get_devices(
     db: AsyncSession = Depends(get_session)
@@ -240,6 +503,49 @@ async def get_devices(
         logger.error(f"Error getting devices: {str(e)}")
         raise HTTPException(status_code=500, detail="获取设备列表失败")
 
+@app.post("/devices/{device_id}/probe", response_model=DeviceResponse)
+async def probe_device(
+    device_id: int,
+    db: AsyncSession = Depends(get_session)
+):
+    """立即探测设备视频流并刷新缓存的分辨率、帧率等信息"""
+    result = await db.execute(
+        select(Device).where(Device.id == device_id)
+    )
+    device = result.scalar_one_or_none()
+    if not device:
+        raise HTTPException(status_code=404, detail="设备不存在")
+    if capture_service.is_active(device.id):
+        apply_probe(device, {"reachable": True, "checked_at": datetime.utcnow()})
+    else:
+        await device_prober.probe_device(device)
+    await db.commit()
+    await db.refresh(device)
+    return device
+
+@app.put("/devices/{device_id}/roi", response_model=DeviceResponse)
+async def update_device_roi(
+    device_id: int,
+    update: RoiUpdate,
+    db: AsyncSession = Depends(get_session)
+):
+    """设置设备的监控区域，未单独设置区域的任务在下次启动监控时生效"""
+    result = await db.execute(
+        select(Device).where(Device.id == device_id)
+    )
+    device = result.scalar_one_or_none()
+    if not device:
+        raise HTTPException(status_code=404, detail="设备不存在")
+    try:
+        device.roi = update.roi
+        await db.commit()
+        await db.refresh(device)
+        return device
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error updating device roi: {str(e)}")
+        raise HTTPException(status_code=500, detail="设置监控区域失败")
+
 @app.delete("/devices/{device_id}")
 async def delete_device(
     device_id: int,
@@ -431,6 +737,13 @@ async def get_tasks(db: AsyncSession = Depends(get_session)):
                 "id": task.id,
                 "name": task.name,
                 "status": task.status,
+                "motion_gate": task.motion_gate,
+                "motion_threshold": task.motion_threshold,
+                "motion_max_skip": task.motion_max_skip,
+                "detect_interval": task.detect_interval,
+                "target_fps": task.target_fps,
+                "display_fps": task.display_fps,
+                "roi": task.roi,
                 "device": {
                     "id": device.id,
                     "name": device.name
@@ -445,6 +758,28 @@ async def get_tasks(db: AsyncSession = Depends(get_session)):
     except Exception as e:
         raise HTTPException(status_code=500, detail="获取任务列表失败")
 
+@app.put("/tasks/{task_id}", response_model=TaskResponse)
+async def update_task(
+    task_id: int,
+    update: TaskUpdate,
+    db: AsyncSession = Depends(get_session)
+):
+    """修改任务的分析参数，传 null 表示恢复使用全局配置；运行中的监控任务重新启动后生效"""
+    result = await db.execute(select(Task).where(Task.id == task_id))
+    task = result.scalar_one_or_none()
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    try:
+        for field, value in update.model_dump(exclude_unset=True).items():
+            setattr(task, field, value)
+        await db.commit()
+        await db.refresh(task)
+        return task
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error updating task: {str(e)}")
+        raise HTTPException(status_code=500, detail="修改任务失败")
+
 @app.delete("/tasks/{task_id}")
 async def delete_task(
     task_id: int,
@@ -507,16 +842,16 @@ async def start_task(
             f.write(f"算法: {algorithm.name}\n")
             f.write(f"权重文件: {algorithm.weight_path}\n")
         
-        # 验证RTSP流是否可以打开
-        cap = cv2.VideoCapture(device.rtsp_url)
-        if not cap.isOpened():
-            logger.error(f"Failed to open RTSP stream for device {device.name}")
-            with open(log_file, "a") as f:
-                f.write(f"错误: 无法连接到视频流 {device.rtsp_url}\n")
-            raise HTTPException(status_code=400, detail=f"无法连接到视频流，请检查RTSP地址 '{device.name}' 的视频流，请检查RTSP地址")
-        
-        # 释放摄像头资源
-        cap.release()
+        # 设备已在共享采集中且持续出帧时无需再单独打开一路RTSP连接
+        if not capture_service.is_active(device.id):
+            # 验证RTSP流是否可以打开，探测在线程池中进行，不阻塞其他连接
+            probe = await device_prober.probe_device(device)
+            await db.commit()
+            if not probe["reachable"]:
+                logger.error(f"Failed to open RTSP stream for device {device.name}: {probe['error']}")
+                with open(log_file, "a") as f:
+                    f.write(f"错误: 无法连接到视频流 {device.rtsp_url}（{probe['error']}）\n")
+                raise HTTPException(status_code=400, detail=f"无法连接到视频流，请检查RTSP地址 '{device.name}' 的视频流，请检查RTSP地址")
         
         # 更新任务状态
         task.status = "running"
@@ -581,79 +916,6 @@ async def stop_task(
 async def options_handler(request: Request):
     return Response(status_code=200)
 
-def process_video_task(
-    task_id: int,
-    task_name: str,
-    video_path: str,
-    algorithm_path: str,
-    results_dir: str
-):
-    try:
-        # 初始化处理器
-        processor = VideoProcessor(algorithm_path)
-        
-        # 创建结果目录和日志文件
-        result_dir = os.path.join(results_dir, task_name)
-        os.makedirs(result_dir, exist_ok=True)
-        log_file = os.path.join(result_dir, "process.log")
-        
-        # 打开视频文件
-        cap = cv2.VideoCapture(video_path)
-        frame_count = 0
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        # 创建视频写入器
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        output_path = os.path.join(result_dir, "output.mp4")
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        
-        # 初始化日志
-        with open(log_file, "w") as f:
-            f.write("开始处理视频...\n")
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # 处理帧
-            results = processor.process_frame(frame)
-            if not results['success']:
-                raise Exception(results['error'])
-            
-            # 记录日志
-            processor.log_results(results, log_file, frame_count, total_frames)
-            
-            # 保存处理后的帧
-            out.write(results['frame'])
-            
-            # 每30帧保存一个关键帧
-            if frame_count % 30 == 0:
-                result_path = os.path.join(result_dir, f"frame_{frame_count}.jpg")
-                cv2.imwrite(result_path, results['frame'])
-            
-            frame_count += 1
-        
-        cap.release()
-        out.release()
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error processing video: {str(e)}", exc_info=True)
-        error_file = os.path.join(result_dir, "error.txt")
-        with open(error_file, "w") as f:
-            import traceback
-            f.write(f"Error: {str(e)}\n\nTraceback:\n{traceback.format_exc()}")
-        return False
-
-# 存储进程
-process_dict: Dict[int, Process] = {}
-# 存储进程间通信的队列
-queue_dict: Dict[int, Queue] = {}
-
 async def get_task_info(task_id: int):
     """获取任务信息"""
     try:
@@ -747,7 +1009,8 @@ async def create_test_task(
             name=task.name,
             video_path=video_path,
             algorithm_id=task.algorithm_id,
-            status='stopped'
+            status='stopped',
+            detect_interval=task.detect_interval
         )
         db.add(db_task)
         await db.commit()
@@ -772,49 +1035,6 @@ async def get_test_tasks(db: AsyncSession = Depends(get_session)):
         logger.error(f"Error getting test tasks: {str(e)}")
         raise HTTPException(status_code=500, detail="获取测试任务列表失败")
 
-class VideoProcessor:
-    def __init__(self, model_path: str):
-        """初始化视频处理器"""
-        from ultralytics import YOLO
-        self.model = YOLO(model_path)
-        logger.info(f"YOLO model loaded from {model_path}")
-
-    def process_frame(self, frame):
-        """处理单帧图像"""
-        try:
-            results = self.model(frame)
-            boxes = results[0].boxes
-            processed_frame = results[0].plot()
-            return {
-                'success': True,
-                'frame': processed_frame,
-                'boxes': boxes,
-                'num_objects': len(boxes)
-            }
-        except Exception as e:
-            logger.error(f"Error processing frame: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
-
-    def log_results(self, results, log_file, frame_count=None, total_frames=None):
-        """记录处理结果到日志"""
-        if not results['success']:
-                    return
-                
-        with open(log_file, "a") as f:
-            frame_info = f"\n帧 {frame_count}/{total_frames}:" if frame_count is not None else "\n当前帧:"
-            f.write(frame_info + "\n")
-            f.write(f"检测到 {results['num_objects']} 个目标\n")
-            for box in results['boxes']:
-                cls = int(box.cls)
-                conf = float(box.conf)
-                f.write(f"  类别 {cls}, 置信度 {conf:.2f}\n")
-
-# 存储进程
-process_dict: Dict[int, Process] = {}
-
 @app.post("/test-tasks/{task_id}/start")
 async def start_test_task(task_id: int, db: AsyncSession = Depends(get_session)):
     try:
@@ -837,35 +1057,35 @@ async def start_test_task(task_id: int, db: AsyncSession = Depends(get_session))
         task.status = "running"
         await db.commit()
         
-        # 启动新进程处理视频
-        process = Process(target=process_video_task, args=(
+        # 进度计数器，分段处理时每段占一个槽位
+        if task_id in progress_dict:
+            progress_dict.pop(task_id).close()
+        progress = ProgressCounter.create(max(settings.TEST_SEGMENT_WORKERS, 1))
+        progress_dict[task_id] = progress
+        
+        # 交给预启动的工作进程处理视频
+        task_name = task.name
+        process = worker_pool.submit(
+            f"test_{task_id}",
+            process_video_task,
             task_id,
-            task.name,
+            task_name,
             task.video_path,
             algorithm.weight_path,
-            RESULTS_DIR
-        ))
-        process.start()
-        process_dict[task_id] = process
-        
-        # 启动状态监控
-        async def monitor_process():
-            while True:
-                if not process.is_alive():
-                    async with async_session() as session:
-                        result = await session.execute(
-                            select(TestTask).where(TestTask.id == task_id)
-                        )
-                        task = result.scalar_one()
-                        # 检查结果目录中是否有error.txt来判断是否成功
-                        error_file = os.path.join(RESULTS_DIR, task.name, "error.txt")
-                        task.status = "error" if os.path.exists(error_file) else "completed"
-                        await session.commit()
-                    del process_dict[task_id]
-                    break
-                await asyncio.sleep(1)
-        
-        asyncio.create_task(monitor_process())
+            RESULTS_DIR,
+            progress,
+            task.detect_interval or settings.DETECT_INTERVAL
+        )
+        
+        # 进程结束时由监督器回调更新状态
+        def on_exit(job):
+            # 检查结果目录中是否有error.txt来判断是否成功
+            error_file = os.path.join(RESULTS_DIR, task_name, "error.txt")
+            status = "error" if os.path.exists(error_file) else "completed"
+            progress.finish(status)
+            supervisor.queue_update(TestTask, task_id, status=status)
+        
+        supervisor.add(f"test_{task_id}", process, on_exit)
         
         return {"message": f"测试任务 {task_id} 已启动"}
     except HTTPException:
@@ -887,6 +1107,11 @@ async def stop_test_task(task_id: int, db: AsyncSession = Depends(get_session)):
         
         task.status = "stopped"
         await db.commit()
+        
+        # 终止处理进程
+        supervisor.stop(f"test_{task_id}")
+        if task_id in progress_dict:
+            progress_dict[task_id].finish("stopped")
         return {"message": f"测试任务 {task_id} 已停止"}
     except HTTPException:
         raise
@@ -912,6 +1137,9 @@ async def delete_test_task(task_id: int, db: AsyncSession = Depends(get_session)
         if os.path.exists(task.video_path):
             os.remove(task.video_path)
         
+        if task_id in progress_dict:
+            progress_dict.pop(task_id).close()
+        
         # 删除结果目录
         result_dir = os.path.join(RESULTS_DIR, task.name)
         if os.path.exists(result_dir):
@@ -927,6 +1155,33 @@ async def delete_test_task(task_id: int, db: AsyncSession = Depends(get_session)
         logger.error(f"Error deleting test task: {str(e)}")
         raise HTTPException(status_code=500, detail="删除测试任务失败")
 
+@app.get("/test-tasks/{task_id}/progress")
+async def get_test_task_progress(task_id: int):
+    """测试任务的实时进度，只读取共享内存计数器"""
+    progress = progress_dict.get(task_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="没有该测试任务的进度信息")
+    return progress.snapshot()
+
+@app.get("/test-tasks/{task_id}/progress/stream")
+async def stream_test_task_progress(task_id: int):
+    """以 SSE 定期推送测试任务进度，任务结束后推送最终状态并关闭"""
+    if task_id not in progress_dict:
+        raise HTTPException(status_code=404, detail="没有该测试任务的进度信息")
+
+    async def events():
+        while True:
+            progress = progress_dict.get(task_id)
+            if progress is None:
+                break
+            snapshot = progress.snapshot()
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot["state"] not in ("pending", "running"):
+                break
+            await asyncio.sleep(settings.PROGRESS_PUSH_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/results/{task_name}/frames")
 async def get_test_results(task_name: str):
     try:
@@ -959,128 +1214,81 @@ async def check_video_file(task_name: str):
         logger.info(f"Video file does not exist: {video_path}")
         return {"exists": False, "path": video_path}
 
+@app.get("/detections/{task_name}")
+async def get_detections(
+    task_name: str,
+    start_frame: Optional[int] = None,
+    end_frame: Optional[int] = None,
+    classes: Optional[str] = None,
+    min_conf: Optional[float] = None
+):
+    """按帧区间 [start_frame, end_frame)、类别（逗号分隔的类别编号）和最低置信度查询检测结果"""
+    try:
+        class_ids = [int(cls) for cls in classes.split(",") if cls.strip()] if classes else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="类别参数格式错误")
+    try:
+        directory = detections_dir(os.path.join(RESULTS_DIR, task_name))
+        rows = await asyncio.get_event_loop().run_in_executor(None, partial(
+            query_detections, directory, start_frame, end_frame, class_ids, min_conf
+        ))
+        boxes = np.stack([rows["x1"], rows["y1"], rows["x2"], rows["y2"]], axis=1).astype(float)
+        return {
+            "frame_range": frame_range(directory),
+            "count": len(rows),
+            "frames": rows["frame"].tolist(),
+            "boxes": np.round(boxes, 1).tolist(),
+            "scores": np.round(rows["conf"].astype(float), 3).tolist(),
+            "classes": rows["cls"].tolist(),
+            "track_ids": rows["track"].tolist()
+        }
+    except Exception as e:
+        logger.error(f"Error querying detections: {str(e)}")
+        raise HTTPException(status_code=500, detail="查询检测结果失败")
+
+async def _task_log_file(task_id: int, db: AsyncSession) -> str:
+    """任务日志路径：已创建监控的任务读取监控进程写入的 monitor_algorithm.log，否则读取启动任务时的 process.log"""
+    result = await db.execute(select(MonitorTask.id).where(MonitorTask.task_id == task_id))
+    name = "monitor_algorithm.log" if result.scalar_one_or_none() is not None else "process.log"
+    return os.path.join(RESULTS_DIR, f"task_{task_id}", name)
+
 @app.get("/tasks/{task_id}/log")
-async def get_task_log(task_id: int):
+async def get_task_log(task_id: int, offset: Optional[int] = None, db: AsyncSession = Depends(get_session)):
+    """增量读取任务日志
+
+    不带 offset 时返回日志末尾的内容；之后带上返回的 offset 只读取新增的行。
+    reset 为 true 表示日志已被重写，客户端应清空已显示的内容。
+    """
     try:
-        log_file = os.path.join(RESULTS_DIR, f"task_{task_id}", "process.log")
-        if not os.path.exists(log_file):
-            return {"log": ""}
-        
-        with open(log_file, "r") as f:
-            log = f.read()
-        return {"log": log}
+        log_file = await _task_log_file(task_id, db)
+        log, next_offset, reset = read_log(log_file, offset, settings.LOG_TAIL_BYTES)
+        return {"log": log, "offset": next_offset, "reset": reset}
     except Exception as e:
         logger.error(f"Error getting task log: {str(e)}")
         raise HTTPException(status_code=500, detail="获取任务日志失败")
 
-def process_stream_task(
-    task_id: int,
-    device_url: str,
-    algorithm_path: str,
-    frame_queue: Queue
-):
-    try:
-        logger.info(f"Stream process started for task {task_id}")
-        # 初始化处理器
-        processor = VideoProcessor(algorithm_path)
-        
-        # 创建结果目录和日志文件
-        result_dir = os.path.join(RESULTS_DIR, f"task_{task_id}")
-        os.makedirs(result_dir, exist_ok=True)
-        log_file = os.path.join(result_dir, "monitor_algorithm.log")
-        
-        # 初始化日志
-        with open(log_file, "w") as f:
-            f.write(f"开始处理实时视频流...\n")
-            f.write(f"设备URL: {device_url}\n")
-            f.write(f"算法路径: {algorithm_path}\n")
-        
-        # 打开视频流
-        cap = cv2.VideoCapture(device_url)
-        if not cap.isOpened():
-            raise Exception(f"无法打开视频流: {device_url}")
-        
-        frame_count = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                with open(log_file, "a") as f:
-                    f.write("视频流中断，尝试重新连接...\n")
-                cap.release()
-                time.sleep(1)  # 等待一秒后重试
-                cap = cv2.VideoCapture(device_url)
-                continue
-            
-            # 处理帧
-            results = processor.process_frame(frame)
-            if not results['success']:
-                with open(log_file, "a") as f:
-                    f.write(f"处理帧失败: {results['error']}\n")
-                continue
-            
-            # 记录日志（每100帧记录一次）
-            if frame_count % 100 == 0:
-                processor.log_results(results, log_file)
-            
-            # 将处理后的帧放入队列
-            _, buffer = cv2.imencode('.jpg', results['frame'])
-            try:
-                frame_queue.put(buffer.tobytes(), timeout=0.1)
-            except:
-                logger.debug(f"Queue full for task {task_id}")
-                continue
-            
-            frame_count += 1
-            
-    except Exception as e:
-        logger.error(f"Error in stream processing: {str(e)}")
-        with open(log_file, "a") as f:
-            f.write(f"处理错误: {str(e)}\n")
-    finally:
-        if cap:
-            cap.release()
-        logger.info(f"Stream process stopped for task {task_id}")
+@app.get("/tasks/{task_id}/log/stream")
+async def stream_task_log(task_id: int, request: Request, offset: Optional[int] = None):
+    """以 SSE 推送任务日志的新增内容，断线重连时按 Last-Event-ID 续读"""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    # 推送期间不占用数据库连接
+    async with async_session() as session:
+        log_file = await _task_log_file(task_id, session)
 
-def process_device_preview(
-    device_id: int,
-    device_url: str,
-    frame_queue: Queue
-):
-    try:
-        logger.info(f"Device preview process started for device {device_id}")
-        
-        # 打开视频流
-        cap = cv2.VideoCapture(device_url)
-        if not cap.isOpened():
-            error_msg = f"无法连接到设备，请检查RTSP地址是否正确"
-            frame_queue.put(json.dumps({"error": error_msg}).encode())
-            return
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                logger.warning(f"Failed to read frame from device {device_id}, stopping preview")
-                error_msg = "视频流读取失败，请检查设备状态"
-                frame_queue.put(json.dumps({"error": error_msg}).encode())
-                break
-                continue
-            
-            # 压缩并发送帧
-            _, buffer = cv2.imencode('.jpg', frame)
-            try:
-                frame_queue.put(buffer.tobytes(), timeout=0.1)
-            except:
-                continue
-            
-    except Exception as e:
-        logger.error(f"Error in device preview: {str(e)}")
-    finally:
-        if cap:
-            cap.release()
-        logger.info(f"Device preview process stopped for device {device_id}")
+    async def events():
+        async for log, next_offset, reset in follow_log(
+            log_file, offset, settings.LOG_POLL_INTERVAL, settings.LOG_TAIL_BYTES
+        ):
+            payload = json.dumps({"log": log, "offset": next_offset, "reset": reset}, ensure_ascii=False)
+            yield f"id: {next_offset}\ndata: {payload}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.websocket("/ws/device-preview/{device_id}")
-async def device_preview(websocket: WebSocket, device_id: int):
+async def device_preview(websocket: WebSocket, device_id: int, tier: Optional[str] = None, mode: Optional[str] = None):
+    subscriber = None
     try:
         await websocket.accept()
         logger.info(f"WebSocket connection established for device preview {device_id}")
@@ -1096,33 +1304,43 @@ async def device_preview(websocket: WebSocket, device_id: int):
             await websocket.close(code=4004)
             return
         
-        # 创建新的队列
-        queue_dict[device_id] = Queue(maxsize=30)
+        # 请求直通流时优先转封装摄像头原有的 H.264 码流，无法直通时回退到 JPEG 预览
+        if mode == "fmp4":
+            passthrough = await passthrough_service.subscribe(device_id, rtsp_url)
+            if passthrough is not None:
+                await _send_passthrough(websocket, device_id, *passthrough)
+                return
         
-        # 启动预览进程
-        process = Process(target=process_device_preview, args=(
-            device_id,
-            rtsp_url,
-            queue_dict[device_id]
-        ))
-        process.start()
-        process_dict[device_id] = process
+        # 同一设备已有预览进程时直接复用
+        process = supervisor.get(f"preview_{device_id}")
+        if process is None or device_id not in buffer_dict:
+            _stop_device_preview(device_id)
+            capture_buffer = capture_service.acquire(device_id, rtsp_url, f"preview_{device_id}")
+            frame_buffer = TieredFrameBuffer.create(stream_tiers, settings.FRAME_BUFFER_SLOTS, settings.FRAME_BUFFER_SLOT_SIZE)
+            buffer_dict[device_id] = frame_buffer
+            
+            # 交给预启动的工作进程执行预览
+            process = worker_pool.submit(
+                f"preview_{device_id}",
+                process_device_preview,
+                device_id,
+                capture_buffer,
+                frame_buffer
+            )
+            # 预览进程意外退出时释放资源，观看者会收到流结束通知
+            supervisor.add(f"preview_{device_id}", process, lambda job: _stop_device_preview(device_id))
+        subscriber = stream_hub.subscribe(device_id, buffer_dict[device_id], tier)
         
         # 接收和发送帧
         while True:
             try:
-                if device_id not in queue_dict:
-                    await websocket.close(code=4004)
-                    break
-                # 使用异步执行器从队列中获取数据
-                frame_data = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: queue_dict[device_id].get(timeout=0.1)
-                )
+                frame_data = await subscriber.get(timeout=1.0)
                 await websocket.send_bytes(frame_data)
-            except Empty:
-                await asyncio.sleep(0.01)
+            except asyncio.TimeoutError:
                 continue
+            except StreamClosed:
+                await websocket.close(code=4004)
+                break
             except Exception as e:
                 logger.error(f"Error sending frame for device {device_id}: {str(e)}")
                 break
@@ -1132,14 +1350,36 @@ async def device_preview(websocket: WebSocket, device_id: int):
     except Exception as e:
         logger.error(f"Error in device preview: {str(e)}")
     finally:
-        # 清理资源
-        if device_id in process_dict:
-            process = process_dict[device_id]
-            process.terminate()
-            await asyncio.get_event_loop().run_in_executor(None, process.join)
-            del process_dict[device_id]
-        if device_id in queue_dict:
-            del queue_dict[device_id]
+        # 最后一个观看者离开时清理资源
+        if subscriber is not None:
+            stream_hub.unsubscribe(device_id, subscriber)
+        if stream_hub.subscriber_count(device_id) == 0:
+            _stop_device_preview(device_id)
+
+async def _send_passthrough(websocket: WebSocket, device_id: int, stream: PassthroughStream, subscriber: Subscriber):
+    """先发送 MIME 类型和初始化段，再逐个发送 fMP4 分片"""
+    try:
+        await websocket.send_json({"mime": stream.mime})
+        await websocket.send_bytes(stream.init)
+        while True:
+            try:
+                fragment = await subscriber.get(timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            except StreamClosed:
+                await websocket.close(code=4004)
+                break
+            await websocket.send_bytes(fragment)
+    finally:
+        await passthrough_service.unsubscribe(device_id, subscriber)
+
+def _stop_device_preview(device_id: int):
+    """终止设备预览进程并释放帧缓冲区，进程退出后由监督器回收"""
+    stream_hub.close(device_id)
+    supervisor.stop(f"preview_{device_id}")
+    if device_id in buffer_dict:
+        buffer_dict.pop(device_id).close()
+    capture_service.release(f"preview_{device_id}")
 
 async def get_device_rtsp_url(device_id: int) -> str:
     """获取设备的RTSP URL"""
@@ -1214,19 +1454,10 @@ async def start_monitor_task(monitor_id: int, db: AsyncSession = Depends(get_ses
         monitor.status = "running"
         await db.commit()
         
-        # 创建新的队列
-        queue_key = f"monitor_{monitor_id}"
-        queue_dict[queue_key] = Queue(maxsize=30)
-        
-        # 启动处理进程
-        process = Process(target=process_stream_task, args=(
-            task.id,
-            device.rtsp_url,
-            algorithm.weight_path,
-            queue_dict[queue_key]
-        ))
-        process.start()
-        process_dict[queue_key] = process
+        _launch_monitor(
+            monitor_id, task.id, device.id, device.rtsp_url, algorithm.id, algorithm.weight_path,
+            _monitor_options(task, device)
+        )
         
         return {"message": "监控任务已启动"}
     except HTTPException:
@@ -1235,17 +1466,127 @@ async def start_monitor_task(monitor_id: int, db: AsyncSession = Depends(get_ses
         await db.rollback()
         # 清理资源
         queue_key = f"monitor_{monitor_id}"
-        if queue_key in process_dict:
-            process_dict[queue_key].terminate()
-            process_dict[queue_key].join()
-            del process_dict[queue_key]
-        if queue_key in queue_dict:
-            del queue_dict[queue_key]
+        supervisor.stop(queue_key)
+        _release_monitor(queue_key)
         raise HTTPException(status_code=500, detail="启动监控任务失败")
 
+def _motion_gate(task: Task) -> Optional[MotionGate]:
+    """按任务设置创建运动门控，任务未设置的参数使用全局配置，未启用时返回 None"""
+    enabled = settings.MOTION_GATE if task.motion_gate is None else task.motion_gate
+    if not enabled:
+        return None
+    return MotionGate(
+        settings.MOTION_THRESHOLD if task.motion_threshold is None else task.motion_threshold,
+        settings.MOTION_MAX_SKIP if task.motion_max_skip is None else task.motion_max_skip,
+        settings.MOTION_GATE_WIDTH,
+        settings.MOTION_PIXEL_THRESHOLD
+    )
+
+def _monitor_options(task: Task, device: Device) -> tuple:
+    """传给监控工作进程的分析参数：运动门控、隔帧检测间隔、分析帧率、发送帧率、监控区域，
+    任务未设置的使用全局配置，监控区域优先使用任务的设置"""
+    regions = task.roi or device.roi
+    return (
+        _motion_gate(task),
+        task.detect_interval or settings.DETECT_INTERVAL,
+        settings.TARGET_FPS if task.target_fps is None else task.target_fps,
+        settings.DISPLAY_FPS if task.display_fps is None else task.display_fps,
+        RegionOfInterest(regions) if regions else None,
+    )
+
+def _launch_monitor(
+    monitor_id: int,
+    task_id: int,
+    device_id: int,
+    rtsp_url: str,
+    algorithm_id: int,
+    weight_path: str,
+    options: tuple,
+    resume: bool = False
+):
+    """启动监控工作进程并交给看门狗监视；看门狗重启时再次调用，沿用已有的帧缓冲区
+
+    resume 为 True 时工作进程保留已存储的检测结果，只有用户启动监控时才清空重新开始。
+    """
+    queue_key = f"monitor_{monitor_id}"
+    # 创建新的帧缓冲区，重启时保留原缓冲区，观看者无需重新连接
+    if queue_key not in buffer_dict:
+        buffer_dict[queue_key] = TieredFrameBuffer.create(
+            stream_tiers, settings.FRAME_BUFFER_SLOTS, settings.FRAME_BUFFER_SLOT_SIZE
+        )
+    
+    # 从设备共享采集获取原始帧，关闭共享采集时由工作进程自行抓帧
+    capture_buffer = None
+    if settings.SHARED_CAPTURE:
+        capture_buffer = capture_service.acquire(device_id, rtsp_url, queue_key)
+    
+    # 同一算法的所有监控任务共享一个批处理推理进程
+    inference_client = None
+    if settings.INFERENCE_SERVER:
+        inference_client = inference_service.acquire(algorithm_id, weight_path, queue_key)
+    
+    heartbeat = stream_watchdog.watch(
+        queue_key,
+        partial(
+            _restart_monitor, monitor_id, task_id, device_id, rtsp_url, algorithm_id, weight_path, options
+        ),
+        lambda hung: supervisor.stop(queue_key, kill=hung)
+    )
+    
+    # 交给预启动的工作进程处理视频流
+    process = worker_pool.submit(
+        queue_key,
+        process_stream_task,
+        task_id,
+        rtsp_url,
+        weight_path,
+        RESULTS_DIR,
+        buffer_dict[queue_key],
+        capture_buffer,
+        inference_client,
+        heartbeat,
+        *options,
+        resume
+    )
+    supervisor.add(queue_key, process, partial(_on_monitor_exit, monitor_id))
+
+def _restart_monitor(
+    monitor_id: int,
+    task_id: int,
+    device_id: int,
+    rtsp_url: str,
+    algorithm_id: int,
+    weight_path: str,
+    options: tuple
+):
+    """看门狗重启监控工作进程，设备采集同样没有新帧时一并重启采集进程"""
+    if settings.SHARED_CAPTURE and not capture_service.is_active(device_id, settings.STREAM_FRAME_TIMEOUT):
+        capture_service.restart(device_id)
+    _launch_monitor(monitor_id, task_id, device_id, rtsp_url, algorithm_id, weight_path, options, resume=True)
+
+def _release_monitor(queue_key: str):
+    """释放监控任务的帧缓冲区、设备采集和推理客户端"""
+    stream_watchdog.unwatch(queue_key)
+    stream_hub.close(queue_key)
+    if queue_key in buffer_dict:
+        buffer_dict.pop(queue_key).close()
+    capture_service.release(queue_key)
+    inference_service.release(queue_key)
+
+def _on_monitor_exit(monitor_id: int, job):
+    """监控进程意外退出时交给看门狗延迟重启；未受看门狗监视时释放资源并把状态改为已停止"""
+    queue_key = f"monitor_{monitor_id}"
+    logger.warning(f"Monitor {monitor_id} worker exited unexpectedly (exitcode={job.exitcode})")
+    if stream_watchdog.is_watched(queue_key):
+        stream_watchdog.fail(queue_key, f"exited (exitcode={job.exitcode})")
+        return
+    _release_monitor(queue_key)
+    supervisor.queue_update(MonitorTask, monitor_id, status="stopped")
+
 @app.websocket("/ws/monitor-tasks/{monitor_id}")
-async def monitor_task_ws(websocket: WebSocket, monitor_id: int):
+async def monitor_task_ws(websocket: WebSocket, monitor_id: int, tier: Optional[str] = None):
     queue_key = f"monitor_{monitor_id}"
+    subscriber = None
     try:
         await websocket.accept()
         
@@ -1261,20 +1602,23 @@ async def monitor_task_ws(websocket: WebSocket, monitor_id: int):
                 await websocket.close(code=4004)
                 return
         
+        frame_buffer = buffer_dict.get(queue_key)
+        if frame_buffer is None:
+            await websocket.close(code=4004)
+            return
+        # 每个连接独立订阅，多人观看同一监控时互不影响；tier 指定清晰度档位，不指定时自动选择
+        subscriber = stream_hub.subscribe(queue_key, frame_buffer, tier)
+        
         # 接收和发送帧
         while True:
             try:
-                if queue_key not in queue_dict:
-                    await websocket.close(code=4004)
-                    break
-                frame_data = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: queue_dict[queue_key].get(timeout=0.1)
-                )
+                frame_data = await subscriber.get(timeout=1.0)
                 await websocket.send_bytes(frame_data)
-            except Empty:
-                await asyncio.sleep(0.01)
+            except asyncio.TimeoutError:
                 continue
+            except StreamClosed:
+                await websocket.close(code=4004)
+                break
             except Exception as e:
                 logger.error(f"Error sending frame for monitor {monitor_id}: {str(e)}")
                 break
@@ -1285,17 +1629,8 @@ async def monitor_task_ws(websocket: WebSocket, monitor_id: int):
         logger.error(f"Error in monitor task WebSocket: {str(e)}")
     finally:
         # 异步清理资源
-        pass
-        # if queue_key in process_dict:
-        #     process = process_dict[queue_key]
-        #     process.terminate()
-        #     await asyncio.get_event_loop().run_in_executor(
-        #         None,
-        #         lambda: process.join(timeout=1)
-        #     )
-        #     del process_dict[queue_key]
-        # if queue_key in queue_dict:
-        #     del queue_dict[queue_key]
+        if subscriber is not None:
+            stream_hub.unsubscribe(queue_key, subscriber)
 
 @app.post("/monitor-tasks/{monitor_id}/stop")
 async def stop_monitor_task(
@@ -1315,12 +1650,8 @@ async def stop_monitor_task(
         
         # 清理资源
         queue_key = f"monitor_{monitor_id}"
-        if queue_key in process_dict:
-            process_dict[queue_key].terminate()
-            process_dict[queue_key].join()
-            del process_dict[queue_key]
-        if queue_key in queue_dict:
-            del queue_dict[queue_key]
+        supervisor.stop(queue_key)
+        _release_monitor(queue_key)
         
         return {"message": "监控任务已停止"}
     except HTTPException:
@@ -1355,6 +1686,37 @@ async def delete_monitor_task(
         await db.rollback()
         raise HTTPException(status_code=500, detail="删除监控任务失败")
 
+@app.get("/jobs")
+async def get_jobs():
+    """运行中和最近结束的任务进程，以及工作进程池状态，只读取内存"""
+    return {**supervisor.snapshot(), "pool": worker_pool.stats()}
+
+@app.get("/monitor-tasks/{monitor_id}/health")
+async def get_monitor_health(monitor_id: int):
+    """监控工作进程的心跳、帧率和自动重启记录"""
+    return stream_watchdog.status(f"monitor_{monitor_id}")
+
+@app.get("/monitor-tasks/{monitor_id}/downtime")
+async def get_monitor_downtime(monitor_id: int, limit: int = 50, db: AsyncSession = Depends(get_session)):
+    """服务重启造成的画面中断记录，最新的在前"""
+    result = await db.execute(
+        select(MonitorDowntime)
+        .where(MonitorDowntime.monitor_id == monitor_id)
+        .order_by(MonitorDowntime.id.desc())
+        .limit(limit)
+    )
+    records = []
+    for downtime in result.scalars():
+        recovered_at = downtime.first_frame_at or downtime.resumed_at
+        records.append({
+            "reason": downtime.reason,
+            "started_at": downtime.started_at,
+            "resumed_at": downtime.resumed_at,
+            "first_frame_at": downtime.first_frame_at,
+            "seconds": round((recovered_at - downtime.started_at).total_seconds(), 1) if recovered_at else None,
+        })
+    return records
+
 @app.get("/monitor-tasks")
 async def get_monitor_tasks(db: AsyncSession = Depends(get_session)):
     try:
@@ -0,0 +1,83 @@
+"""add stream probe, analysis and roi columns
+
+Revision ID: 8726bac6bac8
+Revises: 8acc8e99af70
+Create Date: 2026-10-17 01:13:50.930985
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8726bac6bac8'
+down_revision: Union[str, None] = '8acc8e99af70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 设备视频流探测结果缓存和监控区域
+    op.add_column('devices', sa.Column('stream_reachable', sa.Boolean(), nullable=True))
+    op.add_column('devices', sa.Column('stream_width', sa.Integer(), nullable=True))
+    op.add_column('devices', sa.Column('stream_height', sa.Integer(), nullable=True))
+    op.add_column('devices', sa.Column('stream_fps', sa.Float(), nullable=True))
+    op.add_column('devices', sa.Column('stream_codec', sa.String(), nullable=True))
+    op.add_column('devices', sa.Column('stream_checked_at', sa.DateTime(), nullable=True))
+    op.add_column('devices', sa.Column('roi', sa.JSON(), nullable=True))
+
+    # 任务的运动门控、隔帧检测、帧率限制和监控区域，为空时使用全局配置
+    op.add_column('tasks', sa.Column('motion_gate', sa.Boolean(), nullable=True))
+    op.add_column('tasks', sa.Column('motion_threshold', sa.Float(), nullable=True))
+    op.add_column('tasks', sa.Column('motion_max_skip', sa.Float(), nullable=True))
+    op.add_column('tasks', sa.Column('detect_interval', sa.Integer(), nullable=True))
+    op.add_column('tasks', sa.Column('target_fps', sa.Float(), nullable=True))
+    op.add_column('tasks', sa.Column('display_fps', sa.Float(), nullable=True))
+    op.add_column('tasks', sa.Column('roi', sa.JSON(), nullable=True))
+
+    op.add_column('test_tasks', sa.Column('detect_interval', sa.Integer(), nullable=True))
+
+    # 监控中断记录
+    op.create_table(
+        'monitor_downtimes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('monitor_id', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.String(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('resumed_at', sa.DateTime(), nullable=True),
+        sa.Column('first_frame_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['monitor_id'], ['monitor_tasks.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_monitor_downtimes_id'), 'monitor_downtimes', ['id'], unique=False)
+    op.create_index(op.f('ix_monitor_downtimes_monitor_id'), 'monitor_downtimes', ['monitor_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_monitor_downtimes_monitor_id'), table_name='monitor_downtimes')
+    op.drop_index(op.f('ix_monitor_downtimes_id'), table_name='monitor_downtimes')
+    op.drop_table('monitor_downtimes')
+
+    # SQLite 不能直接删除列，批量模式下重建表
+    with op.batch_alter_table('test_tasks') as batch_op:
+        batch_op.drop_column('detect_interval')
+
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('roi')
+        batch_op.drop_column('display_fps')
+        batch_op.drop_column('target_fps')
+        batch_op.drop_column('detect_interval')
+        batch_op.drop_column('motion_max_skip')
+        batch_op.drop_column('motion_threshold')
+        batch_op.drop_column('motion_gate')
+
+    with op.batch_alter_table('devices') as batch_op:
+        batch_op.drop_column('roi')
+        batch_op.drop_column('stream_checked_at')
+        batch_op.drop_column('stream_codec')
+        batch_op.drop_column('stream_fps')
+        batch_op.drop_column('stream_height')
+        batch_op.drop_column('stream_width')
+        batch_op.drop_column('stream_reachable')
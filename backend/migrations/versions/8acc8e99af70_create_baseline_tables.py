@@ -0,0 +1,115 @@
+"""create baseline tables
+
+Revision ID: 8acc8e99af70
+Revises:
+Create Date: 2026-10-17 02:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8acc8e99af70'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 引入迁移之前的数据库由 create_all 建表且没有版本记录，已存在的表直接沿用
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(), nullable=True),
+            sa.Column('password', sa.String(), nullable=True),
+            sa.Column('is_superuser', sa.Boolean(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+        op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+
+    if 'devices' not in existing:
+        op.create_table(
+            'devices',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('rtsp_url', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_devices_id'), 'devices', ['id'], unique=False)
+        op.create_index(op.f('ix_devices_name'), 'devices', ['name'], unique=False)
+
+    if 'algorithms' not in existing:
+        op.create_table(
+            'algorithms',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('weight_path', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_algorithms_id'), 'algorithms', ['id'], unique=False)
+        op.create_index(op.f('ix_algorithms_name'), 'algorithms', ['name'], unique=False)
+
+    if 'tasks' not in existing:
+        op.create_table(
+            'tasks',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('device_id', sa.Integer(), nullable=True),
+            sa.Column('algorithm_id', sa.Integer(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.ForeignKeyConstraint(['algorithm_id'], ['algorithms.id']),
+            sa.ForeignKeyConstraint(['device_id'], ['devices.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+
+    if 'test_tasks' not in existing:
+        op.create_table(
+            'test_tasks',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('video_path', sa.String(), nullable=False),
+            sa.Column('algorithm_id', sa.Integer(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.ForeignKeyConstraint(['algorithm_id'], ['algorithms.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+
+    if 'monitor_tasks' not in existing:
+        op.create_table(
+            'monitor_tasks',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('task_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['task_id'], ['tasks.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('task_id', name='uq_monitor_task_task_id')
+        )
+        op.create_index(op.f('ix_monitor_tasks_id'), 'monitor_tasks', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_monitor_tasks_id'), table_name='monitor_tasks')
+    op.drop_table('monitor_tasks')
+    op.drop_table('test_tasks')
+    op.drop_table('tasks')
+    op.drop_index(op.f('ix_algorithms_name'), table_name='algorithms')
+    op.drop_index(op.f('ix_algorithms_id'), table_name='algorithms')
+    op.drop_table('algorithms')
+    op.drop_index(op.f('ix_devices_name'), table_name='devices')
+    op.drop_index(op.f('ix_devices_id'), table_name='devices')
+    op.drop_table('devices')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
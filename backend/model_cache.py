@@ -0,0 +1,118 @@
+"""进程内的 YOLO 模型缓存
+
+以权重路径和文件哈希为键缓存已加载的模型，同一进程多次使用同一权重时不再重复加载；
+权重文件被覆盖后哈希变化会自动重新加载。缓存按最近使用顺序在内存预算内淘汰，
+模型加载后先做一次预热推理，避免首帧承担初始化开销。
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: str) -> str:
+    """计算权重文件的 SHA1"""
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _model_size(model, weight_path: str) -> int:
+    """估算模型占用的内存字节数，无法统计参数时按权重文件大小估算"""
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters())
+    except Exception:
+        return os.path.getsize(weight_path)
+
+
+class _Entry:
+    def __init__(self, model, size: int):
+        self.model = model
+        self.size = size
+        self.last_used = time.time()
+
+
+class ModelCache:
+    """按最近最少使用淘汰的模型缓存"""
+
+    def __init__(self, memory_budget: int, warmup_size: int = 640):
+        self.memory_budget = memory_budget
+        self.warmup_size = warmup_size
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # 避免每次获取都重新计算大文件的哈希，每个路径只保留最近一次的 (修改时间, 大小, 哈希)
+        self._hashes: Dict[str, Tuple[float, int, str]] = {}
+
+    def _key(self, weight_path: str) -> Tuple[str, str]:
+        path = os.path.abspath(weight_path)
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is None or cached[:2] != (stat.st_mtime, stat.st_size):
+            cached = self._hashes[path] = (stat.st_mtime, stat.st_size, file_hash(path))
+        return path, cached[2]
+
+    def get(self, weight_path: str):
+        """获取已加载的模型，未命中时加载、预热并放入缓存"""
+        key = self._key(weight_path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            entry.last_used = time.time()
+            return entry.model
+
+        start = time.monotonic()
+        from ultralytics import YOLO
+        model = YOLO(weight_path)
+        self._warmup(model)
+        entry = _Entry(model, _model_size(model, weight_path))
+        self._entries[key] = entry
+        logger.info(
+            f"YOLO model loaded from {weight_path} in {time.monotonic() - start:.2f}s "
+            f"({entry.size / (1024 * 1024):.1f} MB)"
+        )
+        self._evict()
+        return model
+
+    def _warmup(self, model):
+        try:
+            model(np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8), verbose=False)
+        except Exception as e:
+            logger.warning(f"Model warmup failed: {str(e)}")
+
+    def _evict(self):
+        # 至少保留最近使用的一个模型
+        while len(self._entries) > 1 and self.memory_usage() > self.memory_budget:
+            (path, _), entry = self._entries.popitem(last=False)
+            if not any(cached_path == path for cached_path, _ in self._entries):
+                self._hashes.pop(path, None)
+            logger.info(f"Evicted model {path} from cache")
+
+    def memory_usage(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def stats(self) -> dict:
+        return {
+            "models": [
+                {"path": path, "hash": digest, "size": entry.size, "last_used": entry.last_used}
+                for (path, digest), entry in self._entries.items()
+            ],
+            "memory_usage": self.memory_usage(),
+            "memory_budget": self.memory_budget,
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self._hashes.clear()
+
+
+# 每个进程一个缓存实例，在常驻的推理进程和工作进程中保持模型常驻
+model_cache = ModelCache(settings.MODEL_CACHE_BUDGET)
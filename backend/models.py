@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Boolean, Float, JSON
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -20,6 +20,15 @@ class Device(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     rtsp_url = Column(String)
+    # 最近一次探测视频流的结果，由后台定期刷新
+    stream_reachable = Column(Boolean)
+    stream_width = Column(Integer)
+    stream_height = Column(Integer)
+    stream_fps = Column(Float)
+    stream_codec = Column(String)
+    stream_checked_at = Column(DateTime)
+    # 监控区域，归一化坐标的多边形列表，为空时分析整个画面
+    roi = Column(JSON)
 
 class Algorithm(Base):
     __tablename__ = "algorithms"
@@ -36,6 +45,17 @@ class Task(Base):
     device_id = Column(Integer, ForeignKey("devices.id"))
     algorithm_id = Column(Integer, ForeignKey("algorithms.id"))
     status = Column(String, default="stopped")
+    # 运动门控，为空时使用全局配置
+    motion_gate = Column(Boolean)
+    motion_threshold = Column(Float)
+    motion_max_skip = Column(Float)
+    # 隔帧检测间隔，为空时使用全局配置
+    detect_interval = Column(Integer)
+    # 监控的分析帧率和发送给观看者的帧率，为空时使用全局配置，0 表示不限制
+    target_fps = Column(Float)
+    display_fps = Column(Float)
+    # 监控区域，设置后覆盖设备的监控区域
+    roi = Column(JSON)
 
     # 添加反向关系
     monitor_task = relationship("MonitorTask", back_populates="task", uselist=False)
@@ -48,6 +68,8 @@ class TestTask(Base):
     video_path = Column(String, nullable=False)
     algorithm_id = Column(Integer, ForeignKey("algorithms.id"))
     status = Column(String, default="stopped")
+    # 隔帧检测间隔，为空时使用全局配置
+    detect_interval = Column(Integer)
 
 class MonitorTask(Base):
     __tablename__ = "monitor_tasks"
@@ -61,4 +83,14 @@ class MonitorTask(Base):
 
     __table_args__ = (
         UniqueConstraint('task_id', name='uq_monitor_task_task_id'),
-    ) 
\ No newline at end of file
+    )
+
+class MonitorDowntime(Base):
+    __tablename__ = "monitor_downtimes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    monitor_id = Column(Integer, ForeignKey("monitor_tasks.id"), index=True, nullable=False)
+    reason = Column(String)  # shutdown: 服务正常关闭, crash: 服务异常退出
+    started_at = Column(DateTime, nullable=False)  # 画面中断的时间
+    resumed_at = Column(DateTime)  # 重新启动工作进程的时间
+    first_frame_at = Column(DateTime)  # 恢复后处理第一帧的时间
@@ -0,0 +1,50 @@
+"""监控任务的运动门控
+
+在缩小的灰度图上与上次推理时的画面做帧差，变化像素占比低于阈值时认为画面静止，跳过推理并沿用上次的检测结果；
+与上次推理的画面而不是上一帧比较，缓慢移动的目标累积到足够变化后同样会触发推理。
+距上次推理超过 max_skip 秒时无论画面是否变化都重新推理，避免过期的检测框长时间停留。
+"""
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """判断当前帧是否需要推理，随任务参数一起传入工作进程"""
+
+    def __init__(self, threshold: float = 0.002, max_skip: float = 5.0, width: int = 160, pixel_threshold: int = 25):
+        # 变化像素占比阈值
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.width = width
+        # 灰度差超过该值的像素视为变化
+        self.pixel_threshold = pixel_threshold
+        self.skipped = 0
+        self._reference: Optional[np.ndarray] = None
+        self._inferred_at = 0.0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        height = max(round(frame.shape[0] * self.width / frame.shape[1]), 1)
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        # 模糊以抑制传感器噪声和压缩块效应
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _changed(self, current: np.ndarray) -> float:
+        """与参考画面相比变化像素的占比"""
+        if self._reference is None or self._reference.shape != current.shape:
+            return 1.0
+        diff = cv2.absdiff(current, self._reference)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        now = time.monotonic()
+        current = self._prepare(frame)
+        if now - self._inferred_at < self.max_skip and self._changed(current) < self.threshold:
+            self.skipped += 1
+            return False
+        self._reference = current
+        self._inferred_at = now
+        return True
@@ -0,0 +1,204 @@
+"""设备预览的 H.264 直通流
+
+由 ffmpeg 把摄像头原有的 H.264 码流直接封装为分片 MP4（-c:v copy，不解码也不重新编码），
+通过 WebSocket 发给浏览器用 Media Source Extensions 播放，CPU 占用和带宽都远低于逐帧 JPEG。
+每个分片以关键帧开始（frag_keyframe），慢速观看者丢弃整个分片后仍能从下一个分片继续解码；
+初始化段（ftyp + moov）缓存下来，中途加入的观看者先收到初始化段再从下一个分片开始播放。
+同一设备的所有直通观看者共享一个 ffmpeg 进程，最后一个观看者离开时结束进程。
+"""
+import asyncio
+import logging
+import shutil
+import struct
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+from stream_hub import Subscriber
+
+logger = logging.getLogger(__name__)
+
+_BOX_HEADER = struct.Struct(">I4s")
+_BOX_LARGESIZE = struct.Struct(">Q")
+
+
+def _codec_string(moov: bytes) -> Optional[str]:
+    """从 moov 的 avcC 中读取 profile 和 level，生成 MSE 需要的 codecs 字符串；不是 H.264 时返回 None"""
+    index = moov.find(b"avcC")
+    if index < 0 or len(moov) < index + 8:
+        return None
+    # avcC: configurationVersion, AVCProfileIndication, profile_compatibility, AVCLevelIndication
+    profile, compatibility, level = moov[index + 5:index + 8]
+    return f"avc1.{profile:02x}{compatibility:02x}{level:02x}"
+
+
+class PassthroughStream:
+    """单个设备的 ffmpeg 转封装进程，读取分片并分发给观看者"""
+
+    def __init__(self, url: str, ffmpeg: str):
+        self.url = url
+        self.ffmpeg = ffmpeg
+        self.mime: Optional[str] = None
+        self.init: Optional[bytes] = None
+        self.subscribers: Set[Subscriber] = set()
+        self.closed = False
+        # 正在等待启动完成的观看者数
+        self.waiters = 0
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._pump: Optional[asyncio.Task] = None
+
+    def _command(self) -> list:
+        command = [self.ffmpeg, "-loglevel", "error", "-nostdin"]
+        if self.url.startswith("rtsp://"):
+            command += ["-rtsp_transport", "tcp"]
+        else:
+            # 本地文件等非实时源按原始帧率读取
+            command += ["-re"]
+        return command + [
+            "-i", self.url, "-map", "0:v:0", "-c:v", "copy", "-an",
+            "-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof", "pipe:1"
+        ]
+
+    async def start(self, timeout: float):
+        """启动 ffmpeg 并等待初始化段，超时或码流不是 H.264 时结束进程并抛出异常"""
+        self._process = await asyncio.create_subprocess_exec(
+            *self._command(),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            await asyncio.wait_for(self._read_init(), timeout)
+        except BaseException:
+            await self.close()
+            raise
+        self._pump = asyncio.create_task(self._run())
+
+    async def _read_box(self) -> Tuple[bytes, bytes]:
+        stdout = self._process.stdout
+        header = await stdout.readexactly(_BOX_HEADER.size)
+        size, box_type = _BOX_HEADER.unpack(header)
+        if size == 1:
+            extended = await stdout.readexactly(_BOX_LARGESIZE.size)
+            header += extended
+            size = _BOX_LARGESIZE.unpack(extended)[0]
+        if size < len(header):
+            raise ValueError(f"invalid {box_type!r} box size {size}")
+        return box_type, header + await stdout.readexactly(size - len(header))
+
+    async def _read_init(self):
+        boxes = []
+        while True:
+            box_type, box = await self._read_box()
+            boxes.append(box)
+            if box_type == b"moov":
+                break
+        self.init = b"".join(boxes)
+        codec = _codec_string(box)
+        if codec is None:
+            raise ValueError("视频流不是 H.264 编码")
+        self.mime = f'video/mp4; codecs="{codec}"'
+
+    async def _run(self):
+        """读取 moof + mdat 组成的分片，完整分片才推送给观看者"""
+        pending = []
+        try:
+            while True:
+                box_type, box = await self._read_box()
+                pending.append(box)
+                if box_type == b"mdat":
+                    fragment = b"".join(pending)
+                    pending = []
+                    for subscriber in self.subscribers:
+                        subscriber.push(fragment)
+        except asyncio.IncompleteReadError:
+            logger.info(f"Passthrough stream ended for {self.url}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error reading passthrough stream {self.url}: {str(e)}")
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for subscriber in self.subscribers:
+            subscriber.close()
+        if self._pump is not None and self._pump is not asyncio.current_task():
+            self._pump.cancel()
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+
+
+class PassthroughService:
+    """按设备管理直通流；未安装 ffmpeg 时不可用，调用方回退到 JPEG 预览"""
+
+    def __init__(self, subscriber_buffer: int = 4, timeout: float = 10.0):
+        self.subscriber_buffer = subscriber_buffer
+        self.timeout = timeout
+        self.ffmpeg = shutil.which("ffmpeg")
+        self._streams: Dict[Hashable, PassthroughStream] = {}
+        self._starting: Dict[Hashable, asyncio.Task] = {}
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    async def subscribe(self, key: Hashable, url: str) -> Optional[Tuple[PassthroughStream, Subscriber]]:
+        """订阅设备的直通流，需要时启动 ffmpeg；无法直通（打开失败、超时、非 H.264）时返回 None"""
+        if not self.available:
+            return None
+        stream = self._streams.get(key)
+        if stream is None or stream.closed:
+            stream = PassthroughStream(url, self.ffmpeg)
+            self._streams[key] = stream
+            self._starting[key] = asyncio.create_task(stream.start(self.timeout))
+        starting = self._starting.get(key)
+        if starting is not None:
+            stream.waiters += 1
+            try:
+                # 多个观看者同时连接时共用同一次启动，某个观看者断开不会取消其他人的等待
+                await asyncio.shield(starting)
+            except asyncio.CancelledError:
+                if stream.waiters == 1 and not stream.subscribers:
+                    # 等待启动的观看者都已离开
+                    starting.cancel()
+                    self._discard(key, stream)
+                raise
+            except Exception as e:
+                logger.warning(f"Passthrough unavailable for {key}: {str(e) or type(e).__name__}")
+                self._discard(key, stream)
+                return None
+            finally:
+                stream.waiters -= 1
+                if self._starting.get(key) is starting and starting.done():
+                    self._starting.pop(key)
+        if stream.closed:
+            return None
+        subscriber = Subscriber(self.subscriber_buffer)
+        stream.subscribers.add(subscriber)
+        return stream, subscriber
+
+    def _discard(self, key: Hashable, stream: PassthroughStream):
+        if self._streams.get(key) is stream:
+            self._streams.pop(key)
+            self._starting.pop(key, None)
+
+    async def unsubscribe(self, key: Hashable, subscriber: Subscriber):
+        """移除观看者，最后一个观看者离开时结束 ffmpeg"""
+        stream = self._streams.get(key)
+        if stream is None or subscriber not in stream.subscribers:
+            return
+        stream.subscribers.remove(subscriber)
+        if not stream.subscribers:
+            self._streams.pop(key)
+            await stream.close()
+
+    async def close_all(self):
+        for task in self._starting.values():
+            task.cancel()
+        self._starting.clear()
+        streams, self._streams = list(self._streams.values()), {}
+        for stream in streams:
+            await stream.close()
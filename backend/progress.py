@@ -0,0 +1,118 @@
+"""基于共享内存的任务进度计数器
+
+工作进程每处理一帧就更新共享内存中的计数，API 进程读取时只访问内存，不读日志也不访问磁盘。
+计数器按槽位划分，视频分段并行处理时每段写入自己的槽位，读取方汇总各槽位得到总进度。
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+# 头部: 总帧数, 开始时间, 槽位数量, 状态
+_HEADER = struct.Struct("<QdII")
+# 槽位: 已处理帧数, 当前帧率, 更新时间
+_SLOT = struct.Struct("<Qdd")
+
+STATES = ["pending", "running", "completed", "error", "stopped"]
+
+# 帧率按此间隔（秒）取样并做指数平滑
+_FPS_INTERVAL = 0.5
+_FPS_SMOOTHING = 0.3
+
+
+class ProgressCounter:
+    """单个任务的进度计数器
+
+    创建方（API 进程）负责释放共享内存；工作进程通过 pickle 传入的句柄附加到同一块内存。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        self._shm = shm
+        self._owner = owner
+        self._closed = False
+        self.slots = _HEADER.unpack_from(shm.buf, 0)[2]
+        # 写入方在本进程内记录各槽位上次取样的 (时间, 帧数)
+        self._samples: Dict[int, tuple] = {}
+
+    @classmethod
+    def create(cls, slots: int = 1) -> "ProgressCounter":
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER.size + slots * _SLOT.size)
+        _HEADER.pack_into(shm.buf, 0, 0, 0.0, slots, 0)
+        for slot in range(slots):
+            _SLOT.pack_into(shm.buf, _HEADER.size + slot * _SLOT.size, 0, 0.0, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ProgressCounter":
+        return cls(shared_memory.SharedMemory(name=name))
+
+    def __reduce__(self):
+        return (ProgressCounter.attach, (self._shm.name,))
+
+    def start(self, total_frames: int):
+        """开始计数，清零各槽位"""
+        _HEADER.pack_into(self._shm.buf, 0, total_frames, time.time(), self.slots, STATES.index("running"))
+        now = time.time()
+        for slot in range(self.slots):
+            _SLOT.pack_into(self._shm.buf, _HEADER.size + slot * _SLOT.size, 0, 0.0, now)
+        self._samples.clear()
+
+    def update(self, processed: int, slot: int = 0):
+        """写入槽位的已处理帧数，并按取样间隔更新帧率"""
+        offset = _HEADER.size + slot * _SLOT.size
+        now = time.monotonic()
+        _, fps, _ = _SLOT.unpack_from(self._shm.buf, offset)
+        sample = self._samples.get(slot)
+        if sample is None:
+            self._samples[slot] = (now, processed)
+        elif now - sample[0] >= _FPS_INTERVAL:
+            current = (processed - sample[1]) / (now - sample[0])
+            fps = current if fps == 0 else fps + _FPS_SMOOTHING * (current - fps)
+            self._samples[slot] = (now, processed)
+        _SLOT.pack_into(self._shm.buf, offset, processed, fps, time.time())
+
+    def finish(self, state: str):
+        """记录任务的最终状态，已完成的槽位帧率清零"""
+        total, started_at, slots, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        _HEADER.pack_into(self._shm.buf, 0, total, started_at, slots, STATES.index(state))
+        for slot in range(self.slots):
+            offset = _HEADER.size + slot * _SLOT.size
+            processed, _, updated_at = _SLOT.unpack_from(self._shm.buf, offset)
+            _SLOT.pack_into(self._shm.buf, offset, processed, 0.0, updated_at)
+
+    def snapshot(self) -> dict:
+        """汇总各槽位的进度，只读取共享内存"""
+        total, started_at, slots, state = _HEADER.unpack_from(self._shm.buf, 0)
+        processed, fps, updated_at = 0, 0.0, started_at
+        for slot in range(slots):
+            slot_processed, slot_fps, slot_updated = _SLOT.unpack_from(self._shm.buf, _HEADER.size + slot * _SLOT.size)
+            processed += slot_processed
+            fps += slot_fps
+            updated_at = max(updated_at, slot_updated)
+        now = time.time()
+        remaining = max(total - processed, 0)
+        eta: Optional[float] = None
+        if STATES[state] == "running" and fps > 0:
+            eta = remaining / fps
+        return {
+            "state": STATES[state],
+            "processed_frames": processed,
+            "total_frames": total,
+            "percent": round(processed / total * 100, 1) if total else None,
+            "fps": round(fps, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "elapsed_seconds": round((now if STATES[state] == "running" else updated_at) - started_at, 1)
+            if started_at else None,
+            "updated_at": updated_at or None,
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
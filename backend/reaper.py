@@ -0,0 +1,54 @@
+"""在后台线程中回收子进程
+
+停止进程时调用方只发送信号或退出通知，等待退出、超时后依次发送 SIGTERM 和 SIGKILL 等阻塞操作
+交给后台线程完成，事件循环中的请求处理、WebSocket 推送和看门狗不会因为等待进程退出而停顿。
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="reaper")
+_pending: Set[Future] = set()
+_lock = threading.Lock()
+
+
+def _reap(process, grace: float, timeout: float, then: Optional[Callable[[], None]]):
+    try:
+        # 已通知退出的进程先等待其自行结束
+        process.join(grace)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"Process {process.pid} did not exit after SIGTERM, killing")
+            process.kill()
+            process.join(1)
+    finally:
+        if then is not None:
+            then()
+
+
+def reap(process, grace: float = 0.0, timeout: float = 5.0, then: Optional[Callable[[], None]] = None) -> Future:
+    """在后台等待进程退出：grace 秒后仍在运行则发送 SIGTERM，再过 timeout 秒强制结束；then 在进程退出后调用"""
+    future = _executor.submit(_reap, process, grace, timeout, then)
+    with _lock:
+        _pending.add(future)
+    future.add_done_callback(_done)
+    return future
+
+
+def _done(future: Future):
+    with _lock:
+        _pending.discard(future)
+    if future.exception() is not None:
+        logger.error(f"Error reaping process: {str(future.exception())}")
+
+
+def wait_all(timeout: Optional[float] = None):
+    """等待所有待回收的进程退出，服务关闭时在线程中调用"""
+    with _lock:
+        pending = list(_pending)
+    wait(pending, timeout)
@@ -0,0 +1,76 @@
+"""监控区域（ROI）
+
+设备或任务可以配置若干个关注区域，每个区域是按画面宽高归一化（0-1）的多边形顶点列表，
+只有两个点时表示以这两点为对角的矩形。推理前把画面裁剪到所有区域的外接矩形，
+检测框映射回原始画面坐标后，只保留中心点落在某个区域内的目标。
+"""
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Regions = List[List[List[float]]]
+
+
+def validate_regions(regions: Optional[Regions]) -> Optional[Regions]:
+    """检查区域格式，空列表视为未设置"""
+    if not regions:
+        return None
+    for region in regions:
+        if len(region) < 2:
+            raise ValueError("每个区域至少需要两个点")
+        for point in region:
+            if len(point) != 2 or not all(0 <= value <= 1 for value in point):
+                raise ValueError("区域顶点需为 [x, y]，坐标按画面宽高归一化到 0-1")
+    return regions
+
+
+class RegionOfInterest:
+    """按帧尺寸换算区域的像素坐标，裁剪推理输入并过滤区域外的检测结果"""
+
+    def __init__(self, regions: Regions):
+        self.regions = regions
+        # 按帧尺寸缓存 (多边形像素坐标, 外接矩形)
+        self._cache: Dict[Tuple[int, int], Tuple[List[np.ndarray], Tuple[int, int, int, int]]] = {}
+
+    def _prepare(self, shape: tuple):
+        key = (shape[0], shape[1])
+        prepared = self._cache.get(key)
+        if prepared is None:
+            height, width = key
+            polygons = []
+            for region in self.regions:
+                points = (np.array(region) * (width, height)).astype(np.float32)
+                if len(points) == 2:
+                    (x1, y1), (x2, y2) = points
+                    points = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+                polygons.append(points)
+            corners = np.concatenate(polygons)
+            x0, y0 = np.floor(corners.min(axis=0)).astype(int)
+            x1, y1 = np.ceil(corners.max(axis=0)).astype(int)
+            # 外接矩形至少保留一个像素
+            x0, y0 = min(max(x0, 0), width - 1), min(max(y0, 0), height - 1)
+            bounds = (x0, y0, max(min(x1, width), x0 + 1), max(min(y1, height), y0 + 1))
+            prepared = self._cache[key] = (polygons, bounds)
+        return prepared
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """裁剪到所有区域的外接矩形（与原帧共享内存）"""
+        _, (x0, y0, x1, y1) = self._prepare(frame.shape)
+        return frame[y0:y1, x0:x1]
+
+    def restore(self, detections: np.ndarray, shape: tuple) -> np.ndarray:
+        """把裁剪画面上的检测框映射回原始画面坐标，并去掉中心点不在任何区域内的目标"""
+        if not len(detections):
+            return detections
+        polygons, (x0, y0, _, _) = self._prepare(shape)
+        detections = detections.copy()
+        detections[:, [0, 2]] += x0
+        detections[:, [1, 3]] += y0
+        centers_x = (detections[:, 0] + detections[:, 2]) / 2
+        centers_y = (detections[:, 1] + detections[:, 3]) / 2
+        keep = [
+            any(cv2.pointPolygonTest(polygon, (float(x), float(y)), False) >= 0 for polygon in polygons)
+            for x, y in zip(centers_x, centers_y)
+        ]
+        return detections[np.array(keep, dtype=bool)]
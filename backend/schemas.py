@@ -1,5 +1,37 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from datetime import datetime
+
+from roi import validate_regions
+
+# 监控区域：每个区域是归一化到 0-1 的 [x, y] 顶点列表，两个点表示矩形
+Regions = Optional[List[List[List[float]]]]
+
+
+class RoiMixin(BaseModel):
+    roi: Regions = None
+
+    @field_validator("roi")
+    @classmethod
+    def check_roi(cls, value):
+        return validate_regions(value)
+
+# 限制帧率的下限：监控进程每分析一帧才更新一次帧心跳，分析间隔必须远小于看门狗的断流超时
+MIN_FPS = 0.1
+
+
+class FpsMixin(BaseModel):
+    target_fps: Optional[float] = None
+    display_fps: Optional[float] = None
+
+    @field_validator("target_fps", "display_fps")
+    @classmethod
+    def check_fps(cls, value):
+        if value is not None and value < 0:
+            raise ValueError("帧率不能为负数")
+        if value and value < MIN_FPS:
+            raise ValueError(f"帧率为 0 表示不限制，否则不能低于 {MIN_FPS}")
+        return value
 
 # 用户相关
 class UserCreate(BaseModel):
@@ -14,14 +46,24 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 # 设备相关
-class DeviceCreate(BaseModel):
+class DeviceCreate(RoiMixin):
     name: str
     rtsp_url: str
 
+class RoiUpdate(RoiMixin):
+    """设置监控区域，roi 为空时清除"""
+
 class DeviceResponse(BaseModel):
     id: int
     name: str
     rtsp_url: str
+    stream_reachable: Optional[bool] = None
+    stream_width: Optional[int] = None
+    stream_height: Optional[int] = None
+    stream_fps: Optional[float] = None
+    stream_codec: Optional[str] = None
+    stream_checked_at: Optional[datetime] = None
+    roi: Regions = None
 
     class Config:
         from_attributes = True
@@ -40,11 +82,22 @@ class AlgorithmResponse(BaseModel):
         from_attributes = True
 
 # 任务相关
-class TaskCreate(BaseModel):
+class TaskCreate(RoiMixin, FpsMixin):
     name: str
     device_id: int
     algorithm_id: int
     status: str = 'stopped'
+    motion_gate: Optional[bool] = None
+    motion_threshold: Optional[float] = Field(None, ge=0, le=1)
+    motion_max_skip: Optional[float] = Field(None, gt=0)
+    detect_interval: Optional[int] = Field(None, ge=1)
+
+class TaskUpdate(RoiMixin, FpsMixin):
+    """修改任务的分析参数，下次启动监控时生效"""
+    motion_gate: Optional[bool] = None
+    motion_threshold: Optional[float] = Field(None, ge=0, le=1)
+    motion_max_skip: Optional[float] = Field(None, gt=0)
+    detect_interval: Optional[int] = Field(None, ge=1)
 
 class TaskResponse(BaseModel):
     id: int
@@ -52,6 +105,13 @@ class TaskResponse(BaseModel):
     device_id: int
     algorithm_id: int
     status: str
+    motion_gate: Optional[bool] = None
+    motion_threshold: Optional[float] = None
+    motion_max_skip: Optional[float] = None
+    detect_interval: Optional[int] = None
+    target_fps: Optional[float] = None
+    display_fps: Optional[float] = None
+    roi: Regions = None
 
     class Config:
         from_attributes = True
@@ -61,6 +121,7 @@ class TestTaskCreate(BaseModel):
     name: str
     algorithm_id: int
     status: str = 'stopped'
+    detect_interval: Optional[int] = Field(None, ge=1)
 
 class TestTaskResponse(BaseModel):
     id: int
@@ -68,6 +129,7 @@ class TestTaskResponse(BaseModel):
     video_path: str
     algorithm_id: int
     status: str
+    detect_interval: Optional[int] = None
 
     class Config:
         from_attributes = True 
\ No newline at end of file
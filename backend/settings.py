@@ -17,6 +17,102 @@ class Settings(BaseSettings):
 
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+
+    # 帧共享内存缓冲区配置
+    FRAME_BUFFER_SLOTS: int = 4
+    FRAME_BUFFER_SLOT_SIZE: int = 2 * 1024 * 1024
+    # 每个 WebSocket 观看者最多缓存的帧数，满时丢弃最旧帧
+    STREAM_SUBSCRIBER_BUFFER: int = 2
+    # 是否由共享采集进程统一解码；关闭时每个监控任务用独立的抓帧线程读取视频流
+    SHARED_CAPTURE: bool = True
+    # 监控画面发送原始帧和检测结果，由前端绘制检测框；关闭时由服务端绘制后发送 JPEG
+    STREAM_CLIENT_RENDER: bool = True
+    # 监控画面和设备预览的清晰度档位，按从高到低排列：最大宽度（0 为原始分辨率）、JPEG 质量、帧率上限（0 为不限）
+    # 每档只在有人观看时编码；观看者通过 ?tier= 指定档位，不指定时按丢帧情况自动选择
+    STREAM_TIERS: list[dict] = [
+        {"name": "high", "width": 0, "quality": 90, "fps": 0},
+        {"name": "medium", "width": 960, "quality": 75, "fps": 15},
+        {"name": "low", "width": 480, "quality": 60, "fps": 5},
+    ]
+    # 自动选档：WINDOW 秒内丢帧达到 MAX_DROPS 时降一档，连续 UP_AFTER 秒不丢帧时升一档
+    STREAM_TIER_MAX_DROPS: int = 3
+    STREAM_TIER_WINDOW: float = 5.0
+    STREAM_TIER_UP_AFTER: float = 20.0
+    # 设备预览的 H.264 直通流（需安装 ffmpeg）：每个观看者最多缓存的分片数，以及等待 ffmpeg 输出初始化段的超时（秒）
+    PREVIEW_PASSTHROUGH_BUFFER: int = 4
+    PREVIEW_PASSTHROUGH_TIMEOUT: float = 10.0
+    # 设备共享采集的原始帧缓冲区槽位数，槽位容量按摄像头实际分辨率确定
+    CAPTURE_BUFFER_SLOTS: int = 3
+
+    # 按算法共享的批处理推理服务；关闭时每个监控任务在自己的进程内加载模型
+    INFERENCE_SERVER: bool = True
+    INFERENCE_MAX_BATCH: int = 16
+    # 凑批的最长等待时间（秒）
+    INFERENCE_MAX_WAIT: float = 0.02
+    # 无监控任务使用后推理进程继续常驻的时间（秒）
+    INFERENCE_IDLE_TIMEOUT: float = 600
+
+    # 每个进程内模型缓存的内存预算（字节）
+    MODEL_CACHE_BUDGET: int = 2 * 1024 * 1024 * 1024
+
+    # 预启动的空闲工作进程数量
+    WORKER_POOL_SIZE: int = 4
+    # 工作进程执行多少个任务后回收重建
+    WORKER_MAX_JOBS: int = 20
+    # 工作进程池健康检查间隔（秒）
+    WORKER_HEALTH_CHECK_INTERVAL: float = 30
+    # 任务状态变更合并写入数据库的间隔（秒）
+    SUPERVISOR_FLUSH_INTERVAL: float = 1.0
+
+    # 监控工作进程看门狗：检查间隔、心跳超时（视为卡死）和无新帧超时（秒）
+    STREAM_WATCHDOG_INTERVAL: float = 2.0
+    STREAM_STALL_TIMEOUT: float = 30.0
+    STREAM_FRAME_TIMEOUT: float = 60.0
+    # 重启延迟从 BASE 开始逐次翻倍，最长 MAX；稳定运行 RESET 秒后重新从 BASE 开始（秒）
+    STREAM_RESTART_BACKOFF_BASE: float = 2.0
+    STREAM_RESTART_BACKOFF_MAX: float = 300.0
+    STREAM_RESTART_RESET: float = 600.0
+    # 服务启动时恢复运行中的监控任务，相邻两路的启动间隔（秒）
+    MONITOR_RESUME_STAGGER: float = 0.5
+    # 监控工作进程把最近处理一帧的时间记录到结果目录的间隔（秒），服务异常退出后据此确定画面中断的开始时间
+    MONITOR_FRAME_MARK_INTERVAL: float = 1.0
+    # 运动门控默认值，任务未单独设置时使用：是否启用、变化像素占比阈值、最长跳过推理的时间（秒）
+    # 帧差在缩放到 MOTION_GATE_WIDTH 宽的灰度图上计算，灰度差超过 MOTION_PIXEL_THRESHOLD 的像素视为变化
+    MOTION_GATE: bool = False
+    MOTION_THRESHOLD: float = 0.002
+    MOTION_MAX_SKIP: float = 5.0
+    MOTION_GATE_WIDTH: int = 160
+    MOTION_PIXEL_THRESHOLD: int = 25
+    # 隔帧检测的默认间隔，任务未单独设置时使用；大于 1 时每隔若干帧检测一次，其余帧由跟踪器推算并输出跟踪编号
+    DETECT_INTERVAL: int = 1
+    # 监控任务默认的分析帧率和发送给观看者的帧率，任务未单独设置时使用
+    # 分析帧率为 0 时尽可能快地处理每一帧；发送帧率为 0 时只发送分析过的帧，大于分析帧率时中间的画面叠加最近一次的检测结果
+    TARGET_FPS: float = 0
+    DISPLAY_FPS: float = 0
+
+    # 设备视频流探测：打开和读取的超时（秒）、同时探测的设备数量，以及后台刷新间隔（秒）
+    DEVICE_PROBE_TIMEOUT: float = 5.0
+    DEVICE_PROBE_CONCURRENCY: int = 4
+    DEVICE_PROBE_INTERVAL: float = 300
+    # 批量导入设备时同时探测的视频流数量，以及单个文件最多包含的设备数
+    DEVICE_IMPORT_CONCURRENCY: int = 32
+    DEVICE_IMPORT_MAX_ROWS: int = 10000
+
+    # 测试任务流水线：每批推理的最大帧数，以及各阶段之间队列可缓存的帧数
+    TEST_PIPELINE_BATCH_SIZE: int = 8
+    TEST_PIPELINE_QUEUE_SIZE: int = 32
+    # 单个测试视频并行处理的最大进程数，为 1 时不分段
+    TEST_SEGMENT_WORKERS: int = 1
+    # 分段时每段至少包含的帧数，避免短视频拆分得过细
+    TEST_SEGMENT_MIN_FRAMES: int = 1500
+    # 检测结果每个分块文件包含的帧数
+    DETECTION_CHUNK_FRAMES: int = 1000
+
+    # 日志增量读取每次最多返回的字节数，以及推送日志时检查新内容的间隔（秒）
+    LOG_TAIL_BYTES: int = 64 * 1024
+    LOG_POLL_INTERVAL: float = 0.5
+    # 推送测试任务进度的间隔（秒）
+    PROGRESS_PUSH_INTERVAL: float = 1.0
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,179 @@
+"""API 进程内的帧广播中心
+
+每路视频流的每个档位只由一个泵协程从共享内存缓冲区读取一次，然后分发给该档的所有订阅者。
+每个订阅者拥有独立的有界缓冲，满时丢弃最旧的帧，慢速客户端不会拖慢其他观看者；
+自动选档的订阅者持续丢帧时换到较低的档位。
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Dict, Hashable, Optional, Set
+
+from stream_tiers import TierController, TieredFrameBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamClosed(Exception):
+    """视频流已停止"""
+
+
+class Subscriber:
+    """单个观看者的有界帧缓冲（满时丢弃最旧帧）"""
+
+    def __init__(self, maxsize: int, tier: int = 0, controller: Optional[TierController] = None):
+        self._frames = deque(maxlen=maxsize)
+        self._event = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.tier = tier
+        # 自动选择档位时根据丢帧情况换档
+        self.controller = controller
+
+    def push(self, data: bytes):
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+        self._frames.append(data)
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def get(self, timeout: Optional[float] = None) -> bytes:
+        """取出下一帧，超时抛出 asyncio.TimeoutError，流停止时抛出 StreamClosed"""
+        while not self._frames:
+            if self.closed:
+                raise StreamClosed()
+            self._event.clear()
+            await asyncio.wait_for(self._event.wait(), timeout)
+        return self._frames.popleft()
+
+
+class _Channel:
+    """一路视频流，每个有人观看的档位由一个泵协程读取并分发"""
+
+    def __init__(self, key: Hashable, frames: TieredFrameBuffer):
+        self.key = key
+        self.frames = frames
+        self.subscribers: Dict[int, Set[Subscriber]] = {}
+        self.pumps: Dict[int, asyncio.Task] = {}
+
+    def count(self) -> int:
+        return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+    def add(self, subscriber: Subscriber):
+        subscribers = self.subscribers.setdefault(subscriber.tier, set())
+        subscribers.add(subscriber)
+        self.frames.set_demand(subscriber.tier, len(subscribers))
+        pump = self.pumps.get(subscriber.tier)
+        if pump is None or pump.done():
+            self.pumps[subscriber.tier] = asyncio.create_task(self.run(subscriber.tier))
+
+    def remove(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.tier)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not self.frames.closed:
+            self.frames.set_demand(subscriber.tier, len(subscribers))
+        if not subscribers:
+            del self.subscribers[subscriber.tier]
+            pump = self.pumps.pop(subscriber.tier, None)
+            if pump is not None:
+                pump.cancel()
+
+    def cancel(self):
+        for pump in self.pumps.values():
+            pump.cancel()
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.close()
+
+    async def run(self, tier: int):
+        frame_buffer = self.frames.buffers[tier]
+        last_seq = 0
+        try:
+            while self.subscribers.get(tier):
+                try:
+                    packet = await frame_buffer.read_async(last_seq, timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                last_seq = packet.seq
+                for subscriber in list(self.subscribers.get(tier, ())):
+                    subscriber.push(packet.data)
+                    if subscriber.controller is not None:
+                        index = subscriber.controller.update(subscriber.dropped)
+                        if index is not None:
+                            self.move(subscriber, index)
+        except RuntimeError:
+            # 缓冲区已被关闭
+            pass
+        except Exception as e:
+            logger.error(f"Error broadcasting stream {self.key}: {str(e)}")
+        finally:
+            if self.pumps.get(tier) is asyncio.current_task():
+                for subscriber in self.subscribers.get(tier, ()):
+                    subscriber.close()
+
+    def move(self, subscriber: Subscriber, tier: int):
+        """把观看者换到另一档，原档位无人观看时工作进程随即停止编码该档"""
+        if tier == subscriber.tier:
+            return
+        logger.info(f"Stream {self.key} subscriber moved from tier {self.frames.tiers[subscriber.tier].name} "
+                    f"to {self.frames.tiers[tier].name}")
+        self.remove(subscriber)
+        subscriber.tier = tier
+        self.add(subscriber)
+
+
+class StreamHub:
+    """按流键管理广播通道"""
+
+    def __init__(self, subscriber_buffer: int = 2, controller_factory: Optional[Callable[[int, int], TierController]] = None):
+        self.subscriber_buffer = subscriber_buffer
+        self.controller_factory = controller_factory or TierController
+        self._channels: Dict[Hashable, _Channel] = {}
+
+    def subscribe(self, key: Hashable, frames: TieredFrameBuffer, tier: Optional[str] = None) -> Subscriber:
+        """订阅一路视频流的指定档位，tier 为空或未知档位时自动选择，从最高档开始按丢帧情况调整"""
+        channel = self._channels.get(key)
+        if channel is None or channel.frames is not frames:
+            if channel is not None:
+                self.close(key)
+            channel = _Channel(key, frames)
+            self._channels[key] = channel
+        index = frames.index(tier) if tier else None
+        if index is None:
+            subscriber = Subscriber(self.subscriber_buffer, 0, self.controller_factory(len(frames.tiers), 0))
+        else:
+            subscriber = Subscriber(self.subscriber_buffer, index)
+        channel.add(subscriber)
+        logger.info(f"Stream {key} now has {channel.count()} subscriber(s)")
+        return subscriber
+
+    def unsubscribe(self, key: Hashable, subscriber: Subscriber) -> int:
+        """取消订阅，返回该流剩余的订阅者数量"""
+        subscriber.close()
+        channel = self._channels.get(key)
+        if channel is None:
+            return 0
+        channel.remove(subscriber)
+        if not channel.subscribers:
+            del self._channels[key]
+            return 0
+        return channel.count()
+
+    def subscriber_count(self, key: Hashable) -> int:
+        channel = self._channels.get(key)
+        return channel.count() if channel else 0
+
+    def close(self, key: Hashable):
+        """流停止时通知所有订阅者"""
+        channel = self._channels.pop(key, None)
+        if channel is not None:
+            channel.cancel()
+
+    def close_all(self):
+        for key in list(self._channels):
+            self.close(key)
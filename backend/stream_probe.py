@@ -0,0 +1,40 @@
+"""探测子进程：python stream_probe.py <url> <timeout>，结果以 JSON 输出到标准输出
+
+只依赖 cv2，批量探测时每个子进程的启动开销尽量小。
+"""
+import json
+import sys
+
+import cv2
+
+
+def probe_stream(url: str, timeout: float) -> dict:
+    """打开视频流并读取一帧，返回流的元数据"""
+    timeout_ms = int(timeout * 1000)
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms,
+    ])
+    try:
+        if not cap.isOpened():
+            return {"reachable": False, "error": "无法打开视频流"}
+        ret, frame = cap.read()
+        if not ret:
+            return {"reachable": False, "error": "无法读取视频帧"}
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") if fourcc else None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return {
+            "reachable": True,
+            "width": frame.shape[1],
+            "height": frame.shape[0],
+            # 部分摄像头不报告帧率或报告异常值
+            "fps": round(fps, 2) if 0 < fps < 1000 else None,
+            "codec": codec or None,
+        }
+    finally:
+        cap.release()
+
+
+if __name__ == "__main__":
+    print(json.dumps(probe_stream(sys.argv[1], float(sys.argv[2]))))
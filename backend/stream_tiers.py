@@ -0,0 +1,191 @@
+"""按清晰度分级的视频流
+
+每路视频流按配置提供若干档（分辨率上限、JPEG 质量、帧率上限），每档对应一个共享内存帧缓冲区。
+API 进程在共享内存中记录每档当前的观看人数，工作进程只编码有人观看的档位，并按该档的帧率限速，
+同一档无论多少人观看都只编码一次。没有人观看时工作进程不做任何编码。
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Callable, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from frame_buffer import SharedFrameBuffer
+
+
+class StreamTier(NamedTuple):
+    name: str
+    # 最大宽度，0 表示保持原始分辨率
+    width: int
+    # JPEG 质量（1-100）
+    quality: int
+    # 帧率上限，0 表示不限制
+    fps: float
+
+
+def load_tiers(specs: List[dict]) -> List[StreamTier]:
+    """从配置读取档位，按清晰度从高到低排列"""
+    return [
+        StreamTier(spec["name"], int(spec.get("width", 0)), int(spec.get("quality", 80)), float(spec.get("fps", 0)))
+        for spec in specs
+    ]
+
+
+class TieredFrameBuffer:
+    """一路视频流各档位的帧缓冲区，以及各档位的观看人数
+
+    创建方（API 进程）负责释放共享内存；工作进程通过 pickle 传入的句柄附加到同一组缓冲区。
+    """
+
+    def __init__(
+        self,
+        tiers: List[StreamTier],
+        buffers: List[SharedFrameBuffer],
+        demand: shared_memory.SharedMemory,
+        owner: bool = False
+    ):
+        self.tiers = tiers
+        self.buffers = buffers
+        self._demand = demand
+        self._demand_struct = struct.Struct(f"<{len(tiers)}I")
+        self._owner = owner
+        self._closed = False
+        # 写入方在本进程内记录各档位下一帧的最早编码时间
+        self._next_at = [0.0] * len(tiers)
+
+    @classmethod
+    def create(cls, tiers: List[StreamTier], slots: int, slot_size: int) -> "TieredFrameBuffer":
+        buffers = [SharedFrameBuffer.create(slots, slot_size) for _ in tiers]
+        demand = shared_memory.SharedMemory(create=True, size=4 * len(tiers))
+        demand.buf[:] = bytes(demand.size)
+        return cls(tiers, buffers, demand, owner=True)
+
+    @classmethod
+    def attach(cls, tiers: List[StreamTier], buffers: List[SharedFrameBuffer], demand_name: str) -> "TieredFrameBuffer":
+        return cls(tiers, buffers, shared_memory.SharedMemory(name=demand_name))
+
+    def __reduce__(self):
+        return (TieredFrameBuffer.attach, (self.tiers, self.buffers, self._demand.name))
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def index(self, name: str) -> Optional[int]:
+        for index, tier in enumerate(self.tiers):
+            if tier.name == name:
+                return index
+        return None
+
+    def set_demand(self, index: int, viewers: int):
+        """API 进程记录档位的观看人数"""
+        counts = list(self._demand_struct.unpack_from(self._demand.buf, 0))
+        counts[index] = viewers
+        self._demand_struct.pack_into(self._demand.buf, 0, *counts)
+
+    def demand(self) -> tuple:
+        return self._demand_struct.unpack_from(self._demand.buf, 0)
+
+    def watched(self) -> bool:
+        return any(self.demand())
+
+    def publish(self, frame: np.ndarray, wrap: Optional[Callable[[bytes], bytes]] = None):
+        """按各档位的分辨率和质量编码一帧并写入对应缓冲区，跳过无人观看或未到帧间隔的档位
+
+        wrap 对编码后的 JPEG 做进一步封装（例如附加检测结果），每档调用一次。
+        """
+        now = time.monotonic()
+        for index, viewers in enumerate(self.demand()):
+            if not viewers or now < self._next_at[index]:
+                continue
+            tier = self.tiers[index]
+            if tier.fps > 0:
+                self._next_at[index] = max(self._next_at[index] + 1.0 / tier.fps, now)
+            image = frame
+            if tier.width and frame.shape[1] > tier.width:
+                height = round(frame.shape[0] * tier.width / frame.shape[1])
+                image = cv2.resize(frame, (tier.width, height), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, tier.quality])
+            if not ok:
+                continue
+            self.buffers[index].write(wrap(jpeg) if wrap else jpeg)
+
+    def write_all(self, data: bytes):
+        """向所有档位写入同一份数据，用于错误提示等消息"""
+        for buffer in self.buffers:
+            buffer.write(data)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for buffer in self.buffers:
+            buffer.close()
+        self._demand.close()
+        if self._owner:
+            try:
+                self._demand.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TierController:
+    """根据观看者的发送积压自动选择档位
+
+    window 秒内因客户端来不及接收而丢弃的帧数达到 max_drops 时降一档；
+    连续 up_after 秒没有丢帧时升一档，升档后很快又降档说明带宽不足，下次升档前的等待时间加倍。
+    """
+
+    def __init__(
+        self,
+        tier_count: int,
+        index: int = 0,
+        max_drops: int = 3,
+        window: float = 5.0,
+        up_after: float = 20.0,
+        up_after_max: float = 300.0
+    ):
+        self.tier_count = tier_count
+        self.index = index
+        self.max_drops = max_drops
+        self.window = window
+        self.base_up_after = up_after
+        self.up_after = up_after
+        self.up_after_max = up_after_max
+        self._window_start = time.monotonic()
+        self._window_drops = 0
+        self._seen_drops = 0
+        self._last_drop = time.monotonic()
+        self._last_change = time.monotonic()
+        self._raised = False
+
+    def update(self, dropped: int) -> Optional[int]:
+        """传入观看者累计丢帧数，需要换档时返回新的档位下标"""
+        now = time.monotonic()
+        new_drops = dropped - self._seen_drops
+        self._seen_drops = dropped
+        if new_drops:
+            self._last_drop = now
+        if now - self._window_start > self.window:
+            self._window_start, self._window_drops = now, 0
+        self._window_drops += new_drops
+
+        if self._window_drops >= self.max_drops and self.index < self.tier_count - 1:
+            if self._raised and now - self._last_change < self.up_after:
+                self.up_after = min(self.up_after * 2, self.up_after_max)
+            return self._change(self.index + 1, now, raised=False)
+        if self.index > 0 and now - max(self._last_drop, self._last_change) >= self.up_after:
+            return self._change(self.index - 1, now, raised=True)
+        if now - self._last_drop >= self.up_after_max:
+            # 长期没有丢帧，恢复初始的升档等待时间
+            self.up_after = self.base_up_after
+        return None
+
+    def _change(self, index: int, now: float, raised: bool) -> int:
+        self.index = index
+        self._raised = raised
+        self._last_change = now
+        self._window_start, self._window_drops = now, 0
+        return index
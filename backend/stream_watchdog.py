@@ -0,0 +1,151 @@
+"""监控工作进程的看门狗
+
+定期检查各监控任务的心跳：心跳超时说明工作进程卡在读帧或推理中，长时间没有新帧说明视频源失效，
+工作进程意外退出也按失败处理。失败后立即结束工作进程，按指数退避延迟重启，
+工作进程稳定运行一段时间后退避次数清零。每个监控任务的重启记录保存在内存中供查询。
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from heartbeat import Heartbeat
+
+logger = logging.getLogger(__name__)
+
+
+class _Watched:
+    def __init__(self, heartbeat: Heartbeat, restart: Callable[[], None], stop: Callable[[bool], None]):
+        self.heartbeat = heartbeat
+        self.restart = restart
+        self.stop = stop
+        self.started_at = time.time()
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+
+
+class StreamWatchdog:
+    """按键登记监控工作进程，检测卡死和断流并按指数退避重启"""
+
+    def __init__(
+        self,
+        interval: float = 2.0,
+        stall_timeout: float = 30.0,
+        frame_timeout: float = 60.0,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        healthy_reset: float = 600.0,
+        history_size: int = 50
+    ):
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.frame_timeout = frame_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.healthy_reset = healthy_reset
+        self.history_size = history_size
+        self._entries: Dict[str, _Watched] = {}
+        self._history: Dict[str, Deque[dict]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+        for key in list(self._entries):
+            self.unwatch(key)
+
+    def watch(self, key: str, restart: Callable[[], None], stop: Callable[[bool], None]) -> Heartbeat:
+        """登记工作进程，返回传给工作进程的心跳；重复登记时沿用原心跳和退避次数
+
+        restart 重新启动工作进程，stop(hung) 结束工作进程，hung 为 True 表示进程已卡死需要强制结束。
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Watched(Heartbeat.create(), restart, stop)
+            self._entries[key] = entry
+        else:
+            entry.restart, entry.stop = restart, stop
+            entry.heartbeat.reset()
+            entry.started_at = time.time()
+        entry.restart_at = None
+        return entry.heartbeat
+
+    def unwatch(self, key: str):
+        """任务停止时调用，取消待执行的重启并释放心跳"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.heartbeat.close()
+
+    def is_watched(self, key: str) -> bool:
+        return key in self._entries
+
+    def fail(self, key: str, reason: str, hung: bool = False):
+        """结束工作进程并安排延迟重启"""
+        entry = self._entries.get(key)
+        if entry is None or entry.restart_at is not None:
+            return
+        entry.failures += 1
+        delay = min(self.backoff_base * 2 ** (entry.failures - 1), self.backoff_max)
+        now = time.time()
+        entry.restart_at = now + delay
+        history = self._history.setdefault(key, deque(maxlen=self.history_size))
+        history.append({
+            "time": now,
+            "reason": reason,
+            "attempt": entry.failures,
+            "delay": delay,
+            "uptime": round(now - entry.started_at, 1),
+        })
+        logger.warning(f"Stream worker {key} failed ({reason}), restart #{entry.failures} in {delay:.1f}s")
+        try:
+            entry.stop(hung)
+        except Exception as e:
+            logger.error(f"Error stopping stream worker {key}: {str(e)}")
+
+    def check(self):
+        now = time.time()
+        for key, entry in list(self._entries.items()):
+            if entry.restart_at is not None:
+                if now >= entry.restart_at:
+                    self._restart(key, entry)
+                continue
+            state = entry.heartbeat.snapshot()
+            if now - state["beat_at"] > self.stall_timeout:
+                self.fail(key, f"no heartbeat for {now - state['beat_at']:.0f}s", hung=True)
+            elif now - (state["last_frame_at"] or entry.started_at) > self.frame_timeout:
+                self.fail(key, f"no frames for {now - (state['last_frame_at'] or entry.started_at):.0f}s")
+            elif entry.failures and now - entry.started_at >= self.healthy_reset:
+                # 稳定运行足够久，之后的失败重新从最短延迟开始退避
+                entry.failures = 0
+
+    def status(self, key: str) -> dict:
+        entry = self._entries.get(key)
+        return {
+            "heartbeat": entry.heartbeat.snapshot() if entry else None,
+            "failures": entry.failures if entry else 0,
+            "restart_at": entry.restart_at if entry else None,
+            "restarts": list(self._history.get(key, ())),
+        }
+
+    def _restart(self, key: str, entry: _Watched):
+        logger.info(f"Restarting stream worker {key}")
+        entry.restart_at = None
+        entry.started_at = time.time()
+        entry.heartbeat.reset()
+        try:
+            entry.restart()
+        except Exception as e:
+            logger.error(f"Error restarting stream worker {key}: {str(e)}")
+            self.fail(key, f"restart failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Error in stream watchdog: {str(e)}")
@@ -0,0 +1,184 @@
+"""统一管理所有任务进程的监督器
+
+所有测试任务、监控任务和设备预览进程都登记在这里。监督器把进程的 sentinel（工作进程池任务还包括结果管道）
+注册到事件循环，进程结束时立即得到通知并调用登记时提供的回调，不需要为每个任务单独轮询。
+主动停止时只发送 SIGTERM 并继续监听，进程退出后在同一个回调中完成回收，超时未退出再发送 SIGKILL，
+整个过程不在事件循环中等待进程。
+任务状态先在内存中更新，再由后台协程定期把积累的变更合并到一个数据库会话中写入。
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+
+from database import async_session
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, key: str, job, on_exit: Optional[Callable]):
+        self.key = key
+        self.job = job
+        self.on_exit = on_exit
+        self.started_at = time.time()
+        self.handles: List[int] = list(getattr(job, "handles", None) or [job.sentinel])
+        # 已主动停止、等待进程退出时超时强制结束的定时器
+        self.kill_timer: Optional[asyncio.TimerHandle] = None
+
+
+class TaskSupervisor:
+    """按键登记任务进程，进程结束时回调，并批量写入任务状态"""
+
+    def __init__(self, flush_interval: float = 1.0, history_size: int = 200, stop_timeout: float = 5.0):
+        self.flush_interval = flush_interval
+        self.history_size = history_size
+        # 主动停止后等待进程退出的时间，超时发送 SIGKILL
+        self.stop_timeout = stop_timeout
+        self._entries: Dict[str, _Entry] = {}
+        # 已停止但进程尚未退出的任务
+        self._stopping: Set[_Entry] = set()
+        self._history: Dict[str, dict] = {}
+        self._pending: Dict[Tuple[Any, int], dict] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def add(self, key: str, job, on_exit: Optional[Callable] = None):
+        """登记已启动的任务进程，进程结束时以 on_exit(job) 回调（可以是协程函数）"""
+        self.stop(key)
+        entry = _Entry(key, job, on_exit)
+        self._entries[key] = entry
+        self._watch(entry)
+
+    def get(self, key: str):
+        """返回仍在运行的任务进程"""
+        entry = self._entries.get(key)
+        return entry.job if entry else None
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return [key for key in self._entries if key.startswith(prefix)]
+
+    def stop(self, key: str, kill: bool = False):
+        """主动终止任务进程，不触发结束回调，也不等待进程退出；进程退出后由监督器回收
+
+        kill 为 True 时直接发送 SIGKILL，用于已经卡死、无法处理 SIGTERM 的进程。
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._record(entry, "stopped")
+        if kill:
+            entry.job.kill()
+        else:
+            entry.job.terminate()
+            entry.kill_timer = self._loop.call_later(self.stop_timeout, self._kill, entry)
+        self._stopping.add(entry)
+
+    async def stop_all(self):
+        """停止所有任务进程并等待退出"""
+        for key in list(self._entries):
+            self.stop(key)
+        deadline = time.monotonic() + self.stop_timeout + 1
+        while self._stopping and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    def queue_update(self, model, row_id: int, **values):
+        """登记数据库状态变更，由后台协程合并写入"""
+        self._pending.setdefault((model, row_id), {}).update(values)
+
+    def snapshot(self) -> dict:
+        """内存中的任务状态，不访问数据库"""
+        now = time.time()
+        return {
+            "running": [
+                {"key": key, "pid": entry.job.pid, "uptime": round(now - entry.started_at, 1)}
+                for key, entry in self._entries.items()
+            ],
+            "finished": list(self._history.values()),
+        }
+
+    async def flush(self):
+        """把积累的状态变更在一个会话中写入数据库"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with async_session() as session:
+                for (model, row_id), values in pending.items():
+                    await session.execute(update(model).where(model.id == row_id).values(**values))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error flushing task status updates: {str(e)}")
+            # 写入失败时保留变更，下次重试，期间产生的新值优先
+            for key, values in pending.items():
+                self._pending[key] = {**values, **self._pending.get(key, {})}
+
+    async def shutdown(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self.stop_all()
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _watch(self, entry: _Entry):
+        for fd in entry.handles:
+            self._loop.add_reader(fd, self._on_ready, entry)
+
+    def _unwatch(self, entry: _Entry):
+        for fd in entry.handles:
+            self._loop.remove_reader(fd)
+
+    def _kill(self, entry: _Entry):
+        if entry in self._stopping and entry.job.is_alive():
+            logger.warning(f"Job {entry.key} did not exit after SIGTERM, killing")
+            entry.job.kill()
+
+    def _on_ready(self, entry: _Entry):
+        # 先取消监听再检查，任务结束时进程池可能立即关闭或复用这些描述符
+        self._unwatch(entry)
+        if entry.job.is_alive():
+            self._watch(entry)
+            return
+        if entry in self._stopping:
+            # 主动停止的进程已退出
+            self._stopping.discard(entry)
+            if entry.kill_timer is not None:
+                entry.kill_timer.cancel()
+            return
+        if self._entries.get(entry.key) is not entry:
+            return
+        key = entry.key
+        del self._entries[key]
+        exitcode = getattr(entry.job, "exitcode", None)
+        logger.info(f"Job {key} exited (exitcode={exitcode})")
+        self._record(entry, "exited")
+        if entry.on_exit is None:
+            return
+        try:
+            result = entry.on_exit(entry.job)
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(result)
+        except Exception as e:
+            logger.error(f"Error handling exit of job {key}: {str(e)}")
+
+    def _record(self, entry: _Entry, reason: str):
+        self._history.pop(entry.key, None)
+        self._history[entry.key] = {
+            "key": entry.key,
+            "reason": reason,
+            "ok": getattr(entry.job, "ok", None),
+            "started_at": entry.started_at,
+            "finished_at": time.time(),
+        }
+        while len(self._history) > self.history_size:
+            self._history.pop(next(iter(self._history)))
@@ -0,0 +1,112 @@
+"""多目标跟踪
+
+隔帧检测时用于在两次检测之间推算目标位置：每次检测后按 IoU 把检测框与已有轨迹贪心匹配（只匹配同类别），
+匹配上的轨迹更新位置并按两次检测间的位移估计每帧速度，未匹配的检测框创建新轨迹，
+连续多次检测都没有匹配上的轨迹被移除。两次检测之间按匀速推算各轨迹的位置。
+每条轨迹有持续不变的编号，随检测结果一起输出。
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from detections import DETECTION_COLUMNS
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组 [x1, y1, x2, y2] 框两两之间的 IoU"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class _Track:
+    def __init__(self, track_id: int, detection: np.ndarray, frame_index: int):
+        self.id = track_id
+        self.box = detection[:4].astype(np.float64)
+        self.velocity = np.zeros(4)
+        self.conf = float(detection[4])
+        self.cls = int(detection[5])
+        self.frame_index = frame_index
+        self.misses = 0
+        self.hits = 1
+
+    def position(self, frame_index: int) -> np.ndarray:
+        return self.box + self.velocity * (frame_index - self.frame_index)
+
+
+class IouTracker:
+    """IoU 匹配加匀速推算的轻量跟踪器，在单个工作进程内按帧顺序调用"""
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2, smoothing: float = 0.5, first_id: int = 1):
+        self.iou_threshold = iou_threshold
+        # 连续多少次检测没有匹配上后移除轨迹
+        self.max_misses = max_misses
+        # 速度估计的平滑系数，越大越相信最新一次的位移
+        self.smoothing = smoothing
+        self._next_id = first_id
+        self._tracks: List[_Track] = []
+
+    def update(self, detections: np.ndarray, frame_index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """用检测帧的结果更新轨迹，返回检测框及对应的轨迹编号"""
+        ids = np.empty(len(detections), dtype=np.int64)
+        unmatched = set(range(len(detections)))
+        matched_tracks = set()
+        if self._tracks and len(detections):
+            predicted = np.array([track.position(frame_index) for track in self._tracks])
+            ious = iou_matrix(predicted, detections[:, :4].astype(np.float64))
+            classes = np.array([track.cls for track in self._tracks])
+            ious[classes[:, None] != detections[None, :, 5].astype(int)] = 0
+            # 按 IoU 从高到低贪心匹配
+            for t, d in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d not in unmatched:
+                    continue
+                self._match(self._tracks[t], detections[d], frame_index)
+                matched_tracks.add(t)
+                unmatched.discard(d)
+                ids[d] = self._tracks[t].id
+
+        survivors = []
+        for index, track in enumerate(self._tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        for d in sorted(unmatched):
+            track = _Track(self._next_id, detections[d], frame_index)
+            self._next_id += 1
+            survivors.append(track)
+            ids[d] = track.id
+        self._tracks = survivors
+        return detections, ids
+
+    def predict(self, frame_index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """推算非检测帧上各轨迹的位置，只输出最近一次检测匹配上的轨迹"""
+        tracks = [track for track in self._tracks if track.misses == 0]
+        boxes = np.empty((len(tracks), DETECTION_COLUMNS), dtype=np.float32)
+        for row, track in zip(boxes, tracks):
+            row[:4] = track.position(frame_index)
+            row[4] = track.conf
+            row[5] = track.cls
+        return boxes, np.array([track.id for track in tracks], dtype=np.int64)
+
+    def _match(self, track: _Track, detection: np.ndarray, frame_index: int):
+        box = detection[:4].astype(np.float64)
+        elapsed = frame_index - track.frame_index
+        if elapsed > 0:
+            velocity = (box - track.box) / elapsed
+            # 轨迹首次匹配时才有第一个速度样本，直接采用
+            track.velocity = velocity if track.hits == 1 else track.velocity + self.smoothing * (velocity - track.velocity)
+        track.box = box
+        track.conf = float(detection[4])
+        track.frame_index = frame_index
+        track.misses = 0
+        track.hits += 1
@@ -0,0 +1,283 @@
+"""预启动的工作进程池
+
+工作进程由 forkserver 派生，forkserver 启动时已导入 torch、cv2、ultralytics 等重量级模块，
+新进程无需重复导入；池中常驻若干空闲进程，测试任务、监控任务和设备预览启动时直接交给空闲进程执行。
+进程执行任务后保留模型缓存，同一进程再次执行相同算法时无需重新加载；执行指定次数后回收重建，避免内存持续增长。
+池的方法在事件循环中调用，回收进程和补充空闲进程都在后台线程中进行。
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection, wait
+from typing import Callable, List, Optional, Set
+
+import reaper
+
+logger = logging.getLogger(__name__)
+
+# forkserver 预先导入的模块，导入失败的模块会被忽略
+PRELOAD_MODULES = ["numpy", "cv2", "torch", "ultralytics", "workers"]
+
+
+def _worker_main(conn: Connection, max_jobs: int):
+    """工作进程：循环接收任务并执行，收到 None 或达到任务次数上限后退出"""
+    logging.basicConfig(level=logging.INFO)
+    jobs = 0
+    while jobs < max_jobs:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        if message == "ping":
+            conn.send("pong")
+            continue
+        target, args = message
+        jobs += 1
+        try:
+            ok = target(*args) is not False
+        except Exception as e:
+            logger.error(f"Error in pooled job {getattr(target, '__name__', target)}: {str(e)}", exc_info=True)
+            ok = False
+        conn.send(("done", ok))
+
+
+class _Worker:
+    def __init__(self, process, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+        self.pinged = False
+
+
+class PoolJob:
+    """池中正在执行的任务，提供与 Process 相同的 is_alive / join / terminate 接口"""
+
+    def __init__(self, pool: "WorkerPool", worker: _Worker, name: str):
+        self.pool = pool
+        self.name = name
+        self.ok: Optional[bool] = None
+        self._worker = worker
+        self._done = False
+        self._terminated = False
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._worker.process.pid
+
+    @property
+    def sentinel(self) -> int:
+        return self._worker.process.sentinel
+
+    @property
+    def handles(self) -> List[int]:
+        """任务结束（收到结果或进程退出）时变为可读的文件描述符"""
+        return [self._worker.conn.fileno(), self._worker.process.sentinel]
+
+    @property
+    def exitcode(self) -> Optional[int]:
+        if self.ok is not None:
+            return 0 if self.ok else 1
+        return self._worker.process.exitcode
+
+    def is_alive(self) -> bool:
+        if self._done:
+            return False
+        try:
+            while self._worker.conn.poll():
+                message = self._worker.conn.recv()
+                # 忽略健康检查的迟到回复
+                if message != "pong":
+                    self.ok = message[1]
+                    # 已发送终止信号的进程不再复用
+                    self._finish(reusable=not self._terminated)
+                    return False
+        except (EOFError, OSError):
+            pass
+        if not self._worker.process.is_alive():
+            self._finish(reusable=False)
+            return False
+        return True
+
+    def join(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                wait([self._worker.conn, self._worker.process.sentinel], remaining)
+            except OSError:
+                break
+
+    def terminate(self):
+        """向所在进程发送 SIGTERM，常驻任务只能通过结束进程停止
+
+        只发送信号不等待，进程退出后由 is_alive() 回收，池会补充新的空闲进程。
+        """
+        if self._done:
+            return
+        self._terminated = True
+        self._worker.process.terminate()
+
+    def kill(self):
+        """强制结束卡在 C 扩展调用中、不响应 SIGTERM 的任务"""
+        if self._done:
+            return
+        self._terminated = True
+        self._worker.process.kill()
+
+    def _finish(self, reusable: bool):
+        self._done = True
+        self.pool._job_finished(self, self._worker, reusable)
+
+
+class WorkerPool:
+    """管理预启动的工作进程，保持 size 个空闲进程随时可用"""
+
+    def __init__(self, size: int, max_jobs: int, preload: Optional[List[str]] = None):
+        self.size = size
+        self.max_jobs = max(max_jobs, 1)
+        self.preload = PRELOAD_MODULES if preload is None else preload
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._idle: List[_Worker] = []
+        self._jobs: Set[PoolJob] = set()
+        self._closed = False
+        # 空闲进程列表同时被事件循环和补充进程的后台线程访问
+        self._lock = threading.Lock()
+        self._filler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="worker-pool")
+
+    def start(self):
+        """启动 forkserver 并预热空闲进程，首次启动需等待预加载模块导入完成，应在线程中调用"""
+        self._ctx.set_forkserver_preload(self.preload)
+        self._fill()
+        logger.info(f"Worker pool started with {len(self._idle)} idle worker(s)")
+
+    def submit(self, name: str, target: Callable, *args) -> PoolJob:
+        """把任务交给空闲进程执行，没有空闲进程时临时派生"""
+        if self._closed:
+            raise RuntimeError("worker pool is closed")
+        while True:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+            if worker is None:
+                worker = self._spawn()
+            if worker.process.is_alive():
+                break
+            self._discard(worker)
+        worker.conn.send((target, args))
+        worker.jobs += 1
+        job = PoolJob(self, worker, name)
+        self._jobs.add(job)
+        logger.info(f"Job {name} submitted to worker {worker.process.pid}")
+        self._replenish()
+        return job
+
+    def health_check(self):
+        """替换无响应或已退出的空闲进程并补足空闲进程
+
+        每次检查向空闲进程发送 ping，下次检查时仍未收到回复的进程视为卡死。
+        执行中的任务由任务监督器负责回收。
+        """
+        with self._lock:
+            idle = list(self._idle)
+        for worker in idle:
+            try:
+                while worker.conn.poll():
+                    if worker.conn.recv() == "pong":
+                        worker.pinged = False
+            except (EOFError, OSError):
+                pass
+            if not worker.process.is_alive() or worker.pinged:
+                logger.warning(f"Worker {worker.process.pid} is unresponsive, replacing")
+                self._remove_idle(worker)
+                continue
+            try:
+                worker.conn.send("ping")
+                worker.pinged = True
+            except OSError:
+                self._remove_idle(worker)
+        self._replenish()
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "busy": len(self._jobs),
+            "jobs": sorted(job.name for job in self._jobs),
+        }
+
+    def shutdown(self):
+        """结束所有进程，等待后台线程中的补充和回收完成，应在线程中调用"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        self._filler.shutdown(wait=True)
+        for job in list(self._jobs):
+            job.terminate()
+            reaper.reap(job._worker.process, then=job._worker.conn.close)
+        self._jobs.clear()
+        for worker in idle:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            reaper.reap(worker.process, grace=5, then=worker.conn.close)
+        reaper.wait_all()
+
+    def _spawn(self) -> _Worker:
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, args=(child_conn, self.max_jobs))
+        process.start()
+        child_conn.close()
+        return _Worker(process, conn)
+
+    def _replenish(self):
+        """在后台线程中补足空闲进程"""
+        if not self._closed:
+            self._filler.submit(self._fill)
+
+    def _fill(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._idle) >= self.size:
+                        return
+                worker = self._spawn()
+                with self._lock:
+                    if not self._closed:
+                        self._idle.append(worker)
+                        continue
+                self._discard(worker)
+        except Exception as e:
+            logger.error(f"Error replenishing worker pool: {str(e)}")
+
+    def _remove_idle(self, worker: _Worker):
+        with self._lock:
+            if worker in self._idle:
+                self._idle.remove(worker)
+        self._discard(worker)
+
+    def _discard(self, worker: _Worker):
+        """在后台回收进程，已通知退出的进程稍等片刻再强制结束"""
+        reaper.reap(worker.process, grace=0.1, then=worker.conn.close)
+
+    def _job_finished(self, job: PoolJob, worker: _Worker, reusable: bool):
+        self._jobs.discard(job)
+        logger.info(f"Job {job.name} finished on worker {worker.process.pid}")
+        with self._lock:
+            reuse = (reusable and not self._closed and len(self._idle) < self.size
+                     and worker.jobs < self.max_jobs and worker.process.is_alive())
+            if reuse:
+                worker.pinged = False
+                self._idle.append(worker)
+        if not reuse:
+            # 达到任务次数上限的进程会自行退出，多余的空闲进程直接回收
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            self._discard(worker)
+            self._replenish()
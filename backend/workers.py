@@ -0,0 +1,704 @@
+"""视频处理工作函数
+
+测试任务、监控任务和设备预览在工作进程中运行的函数都放在这里，不依赖 FastAPI 应用本身，
+工作进程池可以预先导入本模块，接到任务时无需再导入 main。
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
+import cv2
+
+from capture_service import SharedFrameSource, LatestFrameGrabber
+from detection_store import DetectionWriter, clear_detections, detections_dir, frame_range
+from detections import boxes_to_array, draw_detections, empty_detections, log_results, pack_frame_message
+from frame_buffer import SharedFrameBuffer
+from frame_rate import FrameRate
+from stream_tiers import TieredFrameBuffer
+from heartbeat import Heartbeat
+from inference_server import InferenceClient
+from model_cache import model_cache
+from motion_gate import MotionGate
+from roi import RegionOfInterest
+from progress import ProgressCounter
+from tracker import IouTracker
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """向有界队列放入数据，流水线已停止时返回 False"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """从队列取出数据，流水线已停止时返回 None"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+def _decode_stage(cap, frames: queue.Queue, stop: threading.Event, errors: list,
+                  frame_limit: Optional[int] = None):
+    """解码线程：按顺序读取视频帧（最多 frame_limit 帧），结束时放入 None"""
+    try:
+        count = 0
+        while not stop.is_set() and (frame_limit is None or count < frame_limit):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if not _put(frames, frame, stop):
+                return
+            count += 1
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(frames, None, stop)
+
+def _encode_stage(processor, results_queue: queue.Queue, out, result_dir: str, log_file: str,
+                  total_frames: int, stop: threading.Event, errors: list, first_frame: int = 0,
+                  progress: Optional[ProgressCounter] = None, progress_slot: int = 0):
+    """编码线程：按顺序写入检测结果、输出视频和关键帧，定期记录进度日志"""
+    writer = DetectionWriter(detections_dir(result_dir), settings.DETECTION_CHUNK_FRAMES)
+    try:
+        with open(log_file, "a") as log:
+            frame_count = first_frame
+            num_objects = 0
+            while True:
+                results = _get(results_queue, stop)
+                if results is None:
+                    break
+                
+                # 检测结果写入分块存储
+                writer.append(frame_count, results['boxes'], results.get('track_ids'))
+                num_objects += results['num_objects']
+                
+                # 在编码线程绘制检测框，推理线程只负责前向计算
+                draw_detections(results['frame'], results['boxes'], processor.names, results.get('track_ids'))
+                
+                # 保存处理后的帧
+                out.write(results['frame'])
+                
+                # 每30帧保存一个关键帧
+                if frame_count % 30 == 0:
+                    result_path = os.path.join(result_dir, f"frame_{frame_count}.jpg")
+                    cv2.imwrite(result_path, results['frame'])
+                
+                frame_count += 1
+                if progress is not None:
+                    progress.update(frame_count - first_frame, progress_slot)
+                
+                # 记录日志（每100帧记录一次）
+                if frame_count % 100 == 0:
+                    log.write(f"已处理至 {frame_count}/{total_frames} 帧\n")
+                    log.flush()
+            log.write(f"帧 {first_frame}-{frame_count - 1} 处理完成，共检测到 {num_objects} 个目标\n")
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        writer.close()
+
+def _track_batch(processor, tracker: IouTracker, frames, first_index: int, offset: int, detect_interval: int):
+    """隔帧检测：批内只推理检测帧，再按帧顺序更新跟踪器并推算其余帧的检测框
+
+    first_index 为批内首帧的帧号，offset 为该帧在本段中的序号，每段从第一帧开始检测。
+    """
+    detect = [i for i in range(len(frames)) if (offset + i) % detect_interval == 0]
+    detected = dict(zip(detect, processor.process_batch([frames[i] for i in detect], plot=False))) if detect else {}
+    outputs = []
+    for i, frame in enumerate(frames):
+        if i in detected:
+            if not detected[i]['success']:
+                outputs.append(detected[i])
+                continue
+            boxes, track_ids = tracker.update(detected[i]['boxes'], first_index + i)
+        else:
+            boxes, track_ids = tracker.predict(first_index + i)
+        outputs.append({
+            'success': True,
+            'frame': frame,
+            'boxes': boxes,
+            'num_objects': len(boxes),
+            'track_ids': track_ids
+        })
+    return outputs
+
+def _run_pipeline(processor, cap, out, result_dir: str, log_file: str, total_frames: int,
+                  first_frame: int = 0, frame_limit: Optional[int] = None,
+                  progress: Optional[ProgressCounter] = None, progress_slot: int = 0,
+                  detect_interval: int = 1, first_track_id: int = 1):
+    """运行解码、推理、编码三阶段流水线
+
+    解码线程读取视频帧，本线程把排队的帧凑批推理，编码线程写日志、输出视频和关键帧，
+    各阶段通过有界队列连接，I/O 与推理计算相互重叠。任一阶段出错时停止全部阶段并抛出异常。
+    detect_interval 大于 1 时每隔若干帧检测一次，其余帧由跟踪器推算，检测结果带有跟踪编号。
+    """
+    tracker = IouTracker(first_id=first_track_id) if detect_interval > 1 else None
+    processed = 0
+    frames = queue.Queue(maxsize=settings.TEST_PIPELINE_QUEUE_SIZE)
+    results_queue = queue.Queue(maxsize=settings.TEST_PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    errors = []
+    decoder = threading.Thread(target=_decode_stage, args=(cap, frames, stop, errors, frame_limit), daemon=True)
+    encoder = threading.Thread(target=_encode_stage, args=(
+        processor, results_queue, out, result_dir, log_file, total_frames, stop, errors, first_frame,
+        progress, progress_slot
+    ), daemon=True)
+    decoder.start()
+    encoder.start()
+    
+    try:
+        finished = False
+        while not finished and not stop.is_set():
+            # 阻塞等待第一帧，再取走已排队的帧凑成一批
+            frame = _get(frames, stop)
+            if frame is None:
+                break
+            batch = [frame]
+            while len(batch) < settings.TEST_PIPELINE_BATCH_SIZE:
+                try:
+                    frame = frames.get_nowait()
+                except queue.Empty:
+                    break
+                if frame is None:
+                    finished = True
+                    break
+                batch.append(frame)
+            
+            # 处理帧
+            if tracker is None:
+                outputs = processor.process_batch(batch, plot=False)
+            else:
+                outputs = _track_batch(processor, tracker, batch, first_frame + processed, processed, detect_interval)
+            processed += len(batch)
+            for results in outputs:
+                if not results['success']:
+                    raise Exception(results['error'])
+                if not _put(results_queue, results, stop):
+                    break
+        _put(results_queue, None, stop)
+        encoder.join()
+    finally:
+        stop.set()
+        decoder.join()
+        encoder.join()
+    
+    if errors:
+        raise errors[0]
+
+def _open_writer(output_path: str, fps: int, width: int, height: int):
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+# 每段可分配的跟踪编号数
+_SEGMENT_TRACK_IDS = 10_000_000
+
+def _keyframes(video_path: str) -> Optional[List[int]]:
+    """用 ffprobe 读取视频流中关键帧的帧序号（按显示顺序），无法读取时返回 None"""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        # 只解封装不解码，读取每个数据包的时间戳和关键帧标记
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts,flags",
+             "-of", "csv=p=0", video_path],
+            capture_output=True, text=True, check=True, timeout=120
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Failed to read keyframes of {video_path}: {str(e)}")
+        return None
+    packets = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        try:
+            packets.append((int(pts), "K" in flags))
+        except ValueError:
+            # 缺少时间戳时无法确定显示顺序
+            return None
+    packets.sort()
+    return [index for index, (_, key) in enumerate(packets) if key]
+
+def _plan_segments(video_path: str, total_frames: int):
+    """按并行进程数和每段最少帧数把视频划分为连续的帧区间
+
+    返回 (区间列表, 段首是否都是关键帧)。能读取关键帧时分段点取最近的关键帧，
+    各段可以直接定位到段首；否则按帧数均分，各段需要从头顺序读到段首。
+    视频的总帧数只是容器记录的估计值，最后一段的结束位置为 None，一直读到视频结尾。
+    """
+    count = min(settings.TEST_SEGMENT_WORKERS, total_frames // max(settings.TEST_SEGMENT_MIN_FRAMES, 1))
+    if count <= 1:
+        return [(0, None)], False
+    bounds = [total_frames * i // count for i in range(1, count)]
+    keyframes = _keyframes(video_path)
+    if keyframes is not None:
+        bounds = sorted({min(keyframes, key=lambda keyframe: abs(keyframe - bound)) for bound in bounds})
+        bounds = [bound for bound in bounds if 0 < bound < total_frames]
+        if not bounds:
+            return [(0, None)], False
+    return list(zip([0] + bounds, bounds + [None])), keyframes is not None
+
+def _process_segment(
+    index: int,
+    video_path: str,
+    algorithm_path: str,
+    result_dir: str,
+    start: int,
+    end: Optional[int],
+    total_frames: int,
+    progress: Optional[ProgressCounter] = None,
+    detect_interval: int = 1,
+    seek: bool = False
+):
+    """分段工作进程：处理 [start, end) 区间的帧（end 为 None 时读到视频结尾），输出该段的视频和日志"""
+    processor = VideoProcessor(algorithm_path)
+    cap = cv2.VideoCapture(video_path)
+    if seek:
+        # 段首是关键帧，定位后直接从该帧开始解码，不会落到相邻的帧上
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    else:
+        # 按帧号定位对很多编码格式不精确，顺序读取并丢弃段首之前的帧
+        for _ in range(start):
+            if not cap.grab():
+                break
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    out = _open_writer(os.path.join(result_dir, f"segment_{index}.mp4"), fps, width, height)
+    log_file = os.path.join(result_dir, f"segment_{index}.log")
+    open(log_file, "w").close()
+    try:
+        # 各段独立跟踪，跟踪编号按段错开，跨段的目标会得到新的编号
+        _run_pipeline(
+            processor, cap, out, result_dir, log_file, total_frames, start, None if end is None else end - start,
+            progress, index,
+            detect_interval, index * _SEGMENT_TRACK_IDS + 1
+        )
+    finally:
+        cap.release()
+        out.release()
+
+def _process_segments(video_path: str, algorithm_path: str, result_dir: str, segments, total_frames: int,
+                      progress: Optional[ProgressCounter] = None, detect_interval: int = 1, seek: bool = False):
+    """每段在独立进程中并行处理，任务被终止时一并终止各段进程
+
+    分段进程由 forkserver 派生，不继承工作进程中 torch、OpenMP 的线程状态和已初始化的 CUDA；
+    forkserver 在每个工作进程中只启动一次，之后的测试任务直接复用。
+    """
+    from worker_pool import PRELOAD_MODULES
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(PRELOAD_MODULES)
+    processes = [
+        ctx.Process(target=_process_segment, args=(
+            index, video_path, algorithm_path, result_dir, start, end, total_frames, progress, detect_interval,
+            seek
+        ))
+        for index, (start, end) in enumerate(segments)
+    ]
+    
+    def terminate(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise SystemExit(1)
+    
+    previous = signal.signal(signal.SIGTERM, terminate)
+    try:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+    
+    failed = [index for index, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        raise Exception(f"第 {', '.join(str(index + 1) for index in failed)} 段视频处理失败")
+
+def _merge_segments(result_dir: str, count: int, log_file: str, output_path: str,
+                    fps: int, width: int, height: int):
+    """按帧顺序合并各段的日志和输出视频，并删除分段文件"""
+    with open(log_file, "a") as log:
+        for index in range(count):
+            segment_log = os.path.join(result_dir, f"segment_{index}.log")
+            with open(segment_log) as f:
+                shutil.copyfileobj(f, log)
+            os.remove(segment_log)
+    
+    videos = [os.path.join(result_dir, f"segment_{index}.mp4") for index in range(count)]
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        # 各段独立编码且都以关键帧开头，可以直接拼接码流而无需重新编码
+        list_file = os.path.join(result_dir, "segments.txt")
+        with open(list_file, "w") as f:
+            for video in videos:
+                f.write(f"file '{os.path.abspath(video)}'\n")
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", list_file, "-c", "copy", output_path],
+            check=True
+        )
+        os.remove(list_file)
+    else:
+        out = _open_writer(output_path, fps, width, height)
+        for video in videos:
+            cap = cv2.VideoCapture(video)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                out.write(frame)
+            cap.release()
+        out.release()
+    for video in videos:
+        if os.path.exists(video):
+            os.remove(video)
+
+def process_video_task(
+    task_id: int,
+    task_name: str,
+    video_path: str,
+    algorithm_path: str,
+    results_dir: str,
+    progress: Optional[ProgressCounter] = None,
+    detect_interval: int = 1
+):
+    """离线处理测试视频
+
+    较长的视频按 TEST_SEGMENT_WORKERS 划分为多段，在多个进程中并行处理后按帧顺序合并。
+    处理进度实时写入共享内存计数器 progress。detect_interval 大于 1 时隔帧检测并跟踪目标。
+    """
+    # 创建结果目录和日志文件
+    result_dir = os.path.join(results_dir, task_name)
+    os.makedirs(result_dir, exist_ok=True)
+    log_file = os.path.join(result_dir, "process.log")
+    try:
+        # 打开视频文件
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        output_path = os.path.join(result_dir, "output.mp4")
+        
+        # 初始化日志，清除上次运行的检测结果
+        with open(log_file, "w") as f:
+            f.write("开始处理视频...\n")
+        clear_detections(detections_dir(result_dir))
+        if progress is not None:
+            progress.start(total_frames)
+        
+        segments, seek = _plan_segments(video_path, total_frames)
+        if len(segments) > 1:
+            cap.release()
+            logger.info(f"Processing test task {task_id} in {len(segments)} segments")
+            _process_segments(video_path, algorithm_path, result_dir, segments, total_frames, progress,
+                              detect_interval, seek)
+            _merge_segments(result_dir, len(segments), log_file, output_path, fps, width, height)
+            return True
+        
+        # 初始化处理器
+        processor = VideoProcessor(algorithm_path)
+        out = _open_writer(output_path, fps, width, height)
+        try:
+            _run_pipeline(processor, cap, out, result_dir, log_file, total_frames, progress=progress,
+                          detect_interval=detect_interval)
+        finally:
+            cap.release()
+            out.release()
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}", exc_info=True)
+        error_file = os.path.join(result_dir, "error.txt")
+        with open(error_file, "w") as f:
+            import traceback
+            f.write(f"Error: {str(e)}\n\nTraceback:\n{traceback.format_exc()}")
+        return False
+
+class VideoProcessor:
+    def __init__(self, model_path: str):
+        """初始化视频处理器"""
+        # 同一进程内复用已加载并预热的模型
+        self.model = model_cache.get(model_path)
+
+    @property
+    def names(self):
+        """类别编号到名称的映射"""
+        return self.model.names
+
+    def process_frame(self, frame, plot: bool = True):
+        """处理单帧图像"""
+        return self.process_batch([frame], plot)[0]
+
+    def process_batch(self, frames, plot: bool = True):
+        """一次前向计算处理多帧图像，按输入顺序返回每帧的结果
+
+        plot 为 False 时不绘制检测框，结果中的 frame 为原始输入帧，可由调用方在其他线程中用
+        draw_detections 绘制。
+        """
+        frames = list(frames)
+        try:
+            outputs = []
+            for frame, result in zip(frames, self.model(frames, verbose=False)):
+                boxes = boxes_to_array(result.boxes)
+                outputs.append({
+                    'success': True,
+                    'frame': result.plot() if plot else frame,
+                    'boxes': boxes,
+                    'num_objects': len(boxes)
+                })
+            return outputs
+        except Exception as e:
+            logger.error(f"Error processing frames: {str(e)}")
+            return [{'success': False, 'error': str(e)}] * len(frames)
+
+    def log_results(self, results, log_file, frame_count=None, total_frames=None):
+        """记录处理结果到日志"""
+        log_results(results, log_file, frame_count, total_frames)
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(0)
+
+def _publish_frame(frame_buffer: TieredFrameBuffer, frame, boxes, names, track_ids=None):
+    """按有人观看的清晰度档位编码并写入共享内存缓冲区，检测框坐标始终对应原始分辨率"""
+    if settings.STREAM_CLIENT_RENDER:
+        frame_buffer.publish(frame, lambda jpeg: pack_frame_message(jpeg, boxes, names, frame.shape, track_ids))
+    elif frame_buffer.watched():
+        frame_buffer.publish(draw_detections(frame, boxes, names, track_ids))
+
+# 监控结果目录中记录最近处理一帧时间的文件，以文件的修改时间为准
+LAST_FRAME_MARK = "last_frame"
+
+def _mark_frame(path: str):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        open(path, "a").close()
+
+def process_stream_task(
+    task_id: int,
+    device_url: str,
+    algorithm_path: str,
+    results_dir: str,
+    frame_buffer: TieredFrameBuffer,
+    capture_buffer: Optional[SharedFrameBuffer] = None,
+    inference_client: Optional[InferenceClient] = None,
+    heartbeat: Optional[Heartbeat] = None,
+    motion_gate: Optional[MotionGate] = None,
+    detect_interval: int = 1,
+    target_fps: float = 0,
+    display_fps: float = 0,
+    roi: Optional[RegionOfInterest] = None,
+    resume: bool = False
+):
+    """处理监控视频流
+
+    target_fps 限制每秒分析的帧数，按帧的采集时间选帧，与摄像头帧率无关；display_fps 为发送给观看者的帧率，
+    两次分析之间发送的画面叠加最近一次的检测结果，为 0 时只发送分析过的帧。
+    设置监控区域时只对区域的外接矩形做运动判断和推理，检测框映射回原始画面坐标。
+    resume 为 True 表示看门狗重启或服务重启后恢复监控，保留已有的日志和检测结果，帧号接着已存储的最后一帧继续。
+    """
+    source = None
+    writer = None
+    # 监控任务通过终止进程停止，转为 SystemExit 以便写出尚未落盘的检测结果
+    signal.signal(signal.SIGTERM, _raise_system_exit)
+    try:
+        logger.info(f"Stream process started for task {task_id}")
+        # 初始化处理器，优先使用算法共享的批处理推理服务
+        processor = inference_client or VideoProcessor(algorithm_path)
+        
+        # 创建结果目录和日志文件
+        result_dir = os.path.join(results_dir, f"task_{task_id}")
+        os.makedirs(result_dir, exist_ok=True)
+        log_file = os.path.join(result_dir, "monitor_algorithm.log")
+        
+        # 初始化日志，恢复监控时追加
+        with open(log_file, "a" if resume else "w") as f:
+            f.write(f"{'恢复' if resume else '开始'}处理实时视频流...\n")
+            f.write(f"设备URL: {device_url}\n")
+            f.write(f"算法路径: {algorithm_path}\n")
+        
+        # 优先读取设备共享采集，否则由本进程的抓帧线程持续读取视频流
+        # 两种方式都只取最新一帧，推理跟不上时跳帧而不是积压延迟
+        if capture_buffer is not None:
+            source = SharedFrameSource(capture_buffer)
+        else:
+            source = LatestFrameGrabber(device_url)
+        
+        # 检测结果写入分块存储
+        detections_path = detections_dir(result_dir)
+        first_frame = 0
+        if resume:
+            stored = frame_range(detections_path)
+            if stored is not None:
+                first_frame = stored[1] + 1
+        else:
+            clear_detections(detections_path)
+        writer = DetectionWriter(detections_path, settings.DETECTION_CHUNK_FRAMES)
+        
+        frame_count = 0
+        stalled = False
+        mark_file = os.path.join(result_dir, LAST_FRAME_MARK)
+        marked_at = 0.0
+        # 运动门控跳过推理时沿用的上次检测结果
+        last_boxes = None
+        # 隔帧检测时由跟踪器推算非检测帧的检测框
+        tracker = IouTracker() if detect_interval > 1 else None
+        analyze_rate = FrameRate(target_fps)
+        display_rate = FrameRate(display_fps) if display_fps else None
+        # 推理跟不上而跳过的帧和限制分析帧率有意不分析的帧分开统计
+        realtime_skipped = 0
+        rate_skipped = 0
+        waited = False
+        # 最近一次分析的检测结果，发送未分析的画面时叠加
+        boxes, track_ids = empty_detections(), None
+        while True:
+            # 每轮循环写入心跳，看门狗据此判断进程是否卡死
+            if heartbeat:
+                heartbeat.beat()
+            # 限制分析帧率时，在下一次分析或发送画面之前不读取中间的帧
+            if analyze_rate.interval:
+                now = time.time()
+                wait = analyze_rate.wait_time(now)
+                if display_rate is not None and frame_buffer.watched():
+                    wait = min(wait, display_rate.wait_time(now))
+                if wait > 0:
+                    time.sleep(min(wait, 1.0))
+                    waited = True
+                    continue
+            # 断流重连由采集进程或抓帧线程负责
+            skipped = source.skipped
+            frame = source.read(timeout=5.0)
+            if frame is None:
+                if not stalled:
+                    with open(log_file, "a") as f:
+                        f.write("视频流中断，等待重新连接...\n")
+                    stalled = True
+                continue
+            stalled = False
+            # 等待期间到达而未读取的帧是限制帧率有意跳过的
+            if waited:
+                rate_skipped += source.skipped - skipped
+                waited = False
+            else:
+                realtime_skipped += source.skipped - skipped
+            
+            if not analyze_rate.due(source.timestamp):
+                rate_skipped += 1
+                if display_rate is not None and display_rate.due(source.timestamp):
+                    _publish_frame(frame_buffer, frame, boxes, processor.names, track_ids)
+                continue
+            
+            # 隔帧检测时非检测帧由跟踪器推算检测框；检测帧在画面静止时跳过推理，沿用上次的检测结果
+            track_ids = None
+            region = roi.crop(frame) if roi is not None else frame
+            if tracker is not None and frame_count % detect_interval:
+                boxes, track_ids = tracker.predict(frame_count)
+            elif motion_gate is not None and not motion_gate.should_infer(region) and last_boxes is not None:
+                boxes = last_boxes
+                if tracker is not None:
+                    # 画面静止时同样更新跟踪器，避免按旧速度继续推算
+                    boxes, track_ids = tracker.update(boxes, frame_count)
+            else:
+                # 只做推理，需要时由下方统一绘制检测框
+                inferred = processor.process_frame(region, plot=False)
+                if not inferred['success']:
+                    with open(log_file, "a") as f:
+                        f.write(f"处理帧失败: {inferred['error']}\n")
+                    continue
+                boxes = inferred['boxes']
+                if roi is not None:
+                    boxes = roi.restore(boxes, frame.shape)
+                last_boxes = boxes
+                if tracker is not None:
+                    boxes, track_ids = tracker.update(boxes, frame_count)
+            results = {'success': True, 'frame': frame, 'boxes': boxes, 'num_objects': len(boxes), 'track_ids': track_ids}
+            
+            writer.append(first_frame + frame_count, boxes, track_ids)
+            if heartbeat:
+                heartbeat.frame()
+            # 心跳在共享内存中，随 API 进程一起消失，另外定期落盘供服务异常退出后计算中断时间
+            now = time.time()
+            if now - marked_at >= settings.MONITOR_FRAME_MARK_INTERVAL:
+                _mark_frame(mark_file)
+                marked_at = now
+            
+            # 记录日志（每100帧记录一次）
+            if frame_count % 100 == 0:
+                processor.log_results(results, log_file)
+                with open(log_file, "a") as f:
+                    f.write(f"已处理 {frame_count} 帧，为保持实时跳过 {realtime_skipped} 帧\n")
+                    if analyze_rate.interval:
+                        f.write(f"限制分析帧率跳过 {rate_skipped} 帧\n")
+                    if motion_gate is not None:
+                        f.write(f"画面静止跳过推理 {motion_gate.skipped} 帧\n")
+            
+            if display_rate is None or display_rate.due(source.timestamp):
+                _publish_frame(frame_buffer, frame, boxes, processor.names, track_ids)
+            
+            frame_count += 1
+            
+    except Exception as e:
+        logger.error(f"Error in stream processing: {str(e)}")
+        with open(log_file, "a") as f:
+            f.write(f"处理错误: {str(e)}\n")
+    finally:
+        if source:
+            source.release()
+        if writer:
+            writer.close()
+        logger.info(f"Stream process stopped for task {task_id}")
+
+def process_device_preview(
+    device_id: int,
+    capture_buffer: SharedFrameBuffer,
+    frame_buffer: TieredFrameBuffer
+):
+    try:
+        logger.info(f"Device preview process started for device {device_id}")
+        
+        last_seq = 0
+        connected = False
+        while True:
+            # 从设备共享采集缓冲区读取最新一帧
+            packet = capture_buffer.wait(last_seq, timeout=10.0)
+            if packet is None:
+                if connected:
+                    logger.warning(f"No frame from device {device_id}, waiting for capture to reconnect")
+                    error_msg = "视频流读取失败，请检查设备状态"
+                else:
+                    error_msg = f"无法连接到设备，请检查RTSP地址是否正确"
+                frame_buffer.write_all(json.dumps({"error": error_msg}).encode())
+                continue
+            connected = True
+            last_seq = packet.seq
+            
+            # 按有人观看的清晰度档位压缩并写入共享内存缓冲区
+            frame_buffer.publish(packet.to_array())
+            
+    except Exception as e:
+        logger.error(f"Error in device preview: {str(e)}")
+    finally:
+        logger.info(f"Device preview process stopped for device {device_id}")
@@ -0,0 +1,57 @@
+'use client'
+
+import { FrameDetections, classColor } from '@/lib/frame-message'
+
+interface DetectionOverlayProps {
+  detections: FrameDetections
+}
+
+// 叠加在 object-contain 图片上的检测框，viewBox 使用原始画面尺寸，缩放方式与图片一致
+export default function DetectionOverlay({ detections }: DetectionOverlayProps) {
+  const { width, height, boxes, scores, classes, names, track_ids } = detections
+  if (!width || !height) {
+    return null
+  }
+  const stroke = Math.max(Math.round((width + height) / 2 * 0.003), 2)
+  const fontSize = stroke * 8
+
+  return (
+    <svg
+      className="absolute inset-0 w-full h-full pointer-events-none"
+      viewBox={`0 0 ${width} ${height}`}
+      preserveAspectRatio="xMidYMid meet"
+    >
+      {boxes.map(([x1, y1, x2, y2], i) => {
+        const color = classColor(classes[i])
+        const name = `${names[classes[i]] ?? classes[i]} ${scores[i].toFixed(2)}`
+        // 隔帧检测时带有跟踪编号
+        const label = track_ids ? `#${track_ids[i]} ${name}` : name
+        const labelY = y1 - fontSize >= 3 ? y1 - stroke : y1 + fontSize + stroke
+        return (
+          <g key={track_ids ? track_ids[i] : i}>
+            <rect
+              x={x1}
+              y={y1}
+              width={x2 - x1}
+              height={y2 - y1}
+              fill="none"
+              stroke={color}
+              strokeWidth={stroke}
+            />
+            <text
+              x={x1}
+              y={labelY}
+              fill="#fff"
+              fontSize={fontSize}
+              stroke={color}
+              strokeWidth={stroke}
+              paintOrder="stroke"
+            >
+              {label}
+            </text>
+          </g>
+        )
+      })}
+    </svg>
+  )
+}
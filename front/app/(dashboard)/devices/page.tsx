@@ -1,12 +1,13 @@
 'use client'
 
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { Button } from "@/components/ui/button"
 import { Card } from "@/components/ui/card"
 import DeviceForm from '../components/DeviceForm'
 import { Dialog, DialogContent } from "@/components/ui/dialog"
 import { toast } from "sonner"
 import { config } from '@/config'
+import { MsePlayer, supportsPassthrough } from '@/lib/mse-player'
 
 interface Device {
   id: number
@@ -21,6 +22,10 @@ export default function DevicesPage() {
   const [previewWs, setPreviewWs] = useState<WebSocket | null>(null)
   const [previewUrl, setPreviewUrl] = useState<string>('')
   const [previewError, setPreviewError] = useState<string | null>(null)
+  // 直通模式下用 MSE 播放 H.264，否则显示 JPEG 帧
+  const [previewLive, setPreviewLive] = useState(false)
+  const videoRef = useRef<HTMLVideoElement>(null)
+  const playerRef = useRef<MsePlayer | null>(null)
 
   const fetchDevices = async () => {
     try {
@@ -78,6 +83,11 @@ export default function DevicesPage() {
       URL.revokeObjectURL(previewUrl)
       setPreviewUrl('')
     }
+    if (playerRef.current) {
+      playerRef.current.destroy()
+      playerRef.current = null
+    }
+    setPreviewLive(false)
     setPreviewDevice(null)
     setPreviewError(null)
   }
@@ -85,7 +95,10 @@ export default function DevicesPage() {
   const startPreview = (deviceId: number) => {
     cleanupPreview()
     
-    const ws = new WebSocket(`${config.wsUrl}/ws/device-preview/${deviceId}`)
+    // 浏览器支持时请求 H.264 直通流，服务端无法直通时仍发送 JPEG 帧
+    const mode = supportsPassthrough() ? '?mode=fmp4' : ''
+    const ws = new WebSocket(`${config.wsUrl}/ws/device-preview/${deviceId}${mode}`)
+    ws.binaryType = 'arraybuffer'
     const token = localStorage.getItem('token')
     
     const connectionTimeout = setTimeout(() => {
@@ -99,14 +112,30 @@ export default function DevicesPage() {
     }
     
     ws.onmessage = (event) => {
-      try {
+      if (typeof event.data === 'string') {
         const data = JSON.parse(event.data)
         if (data.error) {
           setPreviewError(data.error)
           toast.error(data.error)
-          return
+        } else if (data.mime && videoRef.current) {
+          playerRef.current = new MsePlayer(videoRef.current, data.mime)
+          setPreviewLive(true)
+          setPreviewError(null)
+        }
+        return
+      }
+      if (playerRef.current) {
+        playerRef.current.append(event.data)
+        return
+      }
+      // 预览进程的错误提示以 JSON 字节发送，其余为 JPEG 帧
+      if (new Uint8Array(event.data, 0, 1)[0] === 0x7b) {
+        const data = JSON.parse(new TextDecoder().decode(event.data))
+        if (data.error) {
+          setPreviewError(data.error)
+          toast.error(data.error)
         }
-      } catch {
+      } else {
         if (previewUrl) {
           URL.revokeObjectURL(previewUrl)
         }
@@ -191,7 +220,14 @@ export default function DevicesPage() {
         >
           <DialogContent className="max-w-4xl">
             <div className="aspect-video bg-black relative">
-              {previewUrl ? (
+              <video
+                ref={videoRef}
+                className={previewLive ? "w-full h-full object-contain" : "hidden"}
+                muted
+                autoPlay
+                playsInline
+              />
+              {previewLive ? null : previewUrl ? (
                 <img
                   src={previewUrl}
                   className="w-full h-full object-contain"
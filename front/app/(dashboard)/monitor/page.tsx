@@ -7,6 +7,8 @@ import { toast } from "sonner"
 import { config } from '@/config'
 import { cn } from '@/lib/utils'
 import { wsManager } from '@/lib/websocket-manager'
+import { FrameDetections, parseFrameMessage } from '@/lib/frame-message'
+import DetectionOverlay from '../components/DetectionOverlay'
 
 interface MonitorTask {
   id: number
@@ -19,6 +21,7 @@ interface MonitorTask {
 export default function MonitorPage() {
   const [monitors, setMonitors] = useState<MonitorTask[]>([])
   const [imageUrls, setImageUrls] = useState<{ [key: number]: string }>({})
+  const [detections, setDetections] = useState<{ [key: number]: FrameDetections | undefined }>({})
   const [cleanupFns, setCleanupFns] = useState<{ [key: number]: () => void }>({})
 
   // 获取监控任务列表
@@ -40,6 +43,24 @@ export default function MonitorPage() {
     }
   }
 
+  // 解析画面消息，原始画面和检测结果分开保存，检测框由前端叠加绘制
+  const handleFrame = async (monitorId: number, data: Blob) => {
+    const message = await parseFrameMessage(data)
+    setImageUrls(prev => {
+      if (prev[monitorId]) {
+        URL.revokeObjectURL(prev[monitorId])
+      }
+      return {
+        ...prev,
+        [monitorId]: URL.createObjectURL(message.image)
+      }
+    })
+    setDetections(prev => ({
+      ...prev,
+      [monitorId]: message.detections
+    }))
+  }
+
   useEffect(() => {
     fetchMonitors()
     // 定期刷新监控列表
@@ -58,13 +79,7 @@ export default function MonitorPage() {
     monitors.forEach(monitor => {
       if (monitor.status === 'running') {
         wsManager.startMonitoring(monitor.id, (data: Blob) => {
-          if (imageUrls[monitor.id]) {
-            URL.revokeObjectURL(imageUrls[monitor.id])
-          }
-          setImageUrls(prev => ({
-            ...prev,
-            [monitor.id]: URL.createObjectURL(data)
-          }))
+          handleFrame(monitor.id, data)
         })
       }
     })
@@ -98,14 +113,7 @@ export default function MonitorPage() {
       }
       
       ws.onmessage = (event) => {
-        if (imageUrls[monitorId]) {
-          URL.revokeObjectURL(imageUrls[monitorId])
-        }
-        const blob = new Blob([event.data], { type: 'image/jpeg' })
-        setImageUrls(prev => ({
-          ...prev,
-          [monitorId]: URL.createObjectURL(blob)
-        }))
+        handleFrame(monitorId, event.data)
       }
       
       setCleanupFns(prev => ({
@@ -225,7 +233,7 @@ export default function MonitorPage() {
               </div>
             </div>
 
-            <div className="aspect-video bg-black mt-2">
+            <div className="relative aspect-video bg-black mt-2">
               {imageUrls[monitor.id] && (
                 <img
                   src={imageUrls[monitor.id]}
@@ -233,6 +241,9 @@ export default function MonitorPage() {
                   alt={`Monitor ${monitor.id}`}
                 />
               )}
+              {imageUrls[monitor.id] && detections[monitor.id] && (
+                <DetectionOverlay detections={detections[monitor.id]!} />
+              )}
             </div>
 
             <div className="mt-4 space-x-2">
@@ -0,0 +1,47 @@
+// 监控画面消息：魔数 "SIDF" + 4 字节小端 JSON 头部长度 + JSON 头部（检测结果）+ 原始画面 JPEG
+// 不带魔数的消息为服务端已绘制检测框的 JPEG
+
+const MAGIC = [0x53, 0x49, 0x44, 0x46]
+
+export interface FrameDetections {
+  width: number | null
+  height: number | null
+  boxes: [number, number, number, number][]
+  scores: number[]
+  classes: number[]
+  names: { [cls: string]: string }
+  track_ids?: number[]
+}
+
+export interface FrameMessage {
+  image: Blob
+  detections?: FrameDetections
+}
+
+export async function parseFrameMessage(data: Blob | ArrayBuffer): Promise<FrameMessage> {
+  const buffer = data instanceof Blob ? await data.arrayBuffer() : data
+  const bytes = new Uint8Array(buffer)
+  const hasMagic = bytes.length >= 8 && MAGIC.every((byte, i) => bytes[i] === byte)
+  if (!hasMagic) {
+    return { image: new Blob([buffer], { type: 'image/jpeg' }) }
+  }
+
+  const headerLength = new DataView(buffer).getUint32(4, true)
+  const header = new TextDecoder().decode(bytes.subarray(8, 8 + headerLength))
+  return {
+    image: new Blob([bytes.subarray(8 + headerLength)], { type: 'image/jpeg' }),
+    detections: JSON.parse(header)
+  }
+}
+
+// 与服务端 detections.py 中的调色板一致（RGB）
+const PALETTE = [
+  '#ff3838', '#ff9d97', '#ff701f', '#ffb21d', '#cfd231',
+  '#48f90a', '#92cc17', '#3ddb86', '#1a9334', '#00d4bb',
+  '#2c99a8', '#00c2ff', '#344593', '#6473ff', '#0018ec',
+  '#8438ff', '#520085', '#cb38ff', '#ff95c8', '#ff37c7',
+]
+
+export function classColor(cls: number): string {
+  return PALETTE[cls % PALETTE.length]
+}
@@ -0,0 +1,65 @@
+// 设备预览的 H.264 直通流：服务端先发送 {"mime": ...}，再发送初始化段和各个 fMP4 分片，由 MSE 播放
+
+// 请求直通流前检查浏览器是否支持 MSE 播放 H.264
+export function supportsPassthrough(): boolean {
+  return typeof MediaSource !== 'undefined' && MediaSource.isTypeSupported('video/mp4; codecs="avc1.42E01E"')
+}
+
+// 缓冲中保留的历史时长（秒），更早的部分移除以控制内存
+const KEEP_SECONDS = 10
+// 播放落后直播点超过该时长（秒）时跳到最新画面
+const MAX_LATENCY = 3
+
+export class MsePlayer {
+  private mediaSource = new MediaSource()
+  private sourceBuffer: SourceBuffer | null = null
+  private queue: ArrayBuffer[] = []
+  private objectUrl: string
+
+  constructor(private video: HTMLVideoElement, private mime: string) {
+    this.objectUrl = URL.createObjectURL(this.mediaSource)
+    video.src = this.objectUrl
+    this.mediaSource.addEventListener('sourceopen', () => {
+      this.sourceBuffer = this.mediaSource.addSourceBuffer(this.mime)
+      // 慢速连接可能被服务端丢弃整个分片，按接收顺序拼接时间轴
+      this.sourceBuffer.mode = 'sequence'
+      this.sourceBuffer.addEventListener('updateend', () => this.flush())
+      this.flush()
+    }, { once: true })
+  }
+
+  append(data: ArrayBuffer) {
+    this.queue.push(data)
+    this.flush()
+  }
+
+  private flush() {
+    const buffer = this.sourceBuffer
+    if (!buffer || buffer.updating || this.mediaSource.readyState !== 'open') {
+      return
+    }
+    const ranges = buffer.buffered
+    if (ranges.length) {
+      const end = ranges.end(ranges.length - 1)
+      if (end - this.video.currentTime > MAX_LATENCY) {
+        this.video.currentTime = end - 0.5
+      }
+      if (this.video.currentTime - ranges.start(0) > KEEP_SECONDS * 2) {
+        buffer.remove(ranges.start(0), this.video.currentTime - KEEP_SECONDS)
+        return
+      }
+    }
+    const next = this.queue.shift()
+    if (next) {
+      buffer.appendBuffer(next)
+      this.video.play().catch(() => {})
+    }
+  }
+
+  destroy() {
+    this.queue = []
+    this.video.removeAttribute('src')
+    this.video.load()
+    URL.revokeObjectURL(this.objectUrl)
+  }
+}